@@ -1,74 +1,115 @@
+import time
+_started = time.perf_counter()
 import os
 import sys
 import json
 import shutil
 import random
 import re
-from glob import glob
-from docx import Document
 from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtGui import QPainter, QPixmap
-from collections import defaultdict
 from datetime import datetime
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.pyplot as plt
-import numpy as np
-import csv
+from functools import partial
+from question_bank import QuestionBank, list_sections
+from docx_stream import parse_docx
+from results_store import ResultsStore
+from stats_engine import StatsRollup, chart_series
+from results_model import ExamColumns, ResultsTableModel
+from review_model import review_view
+import results_export
+from workers import run_task
+from bank_watcher import BankWatcher
+from sampling import get_index, recency_weights
+from dedup import get_dedup
+from attempt_log import AttemptLog
+import tracing
 
 # Constants
 tests_base = './tests_json'
-results_file = 'results.json'
+results_file = 'results.jsonl'
+# Formato antiguo: se migra a results.jsonl la primera vez
+legacy_results_file = 'results.json'
+# Agregados de estadísticas, al día con results.jsonl
+stats_file = 'results.stats.json'
+# Respuestas pregunta a pregunta
+attempts_dir = 'attempts'
+# Resultados que se muestran en la búsqueda de preguntas
+search_limit = 200
+# Backend de lectura de .docx: 'docx' (python-docx) o 'stream' (docx_stream)
+docx_parser = os.environ.get('TEST_DOCX_PARSER', 'docx')
+
+_bank = None
+results_store = ResultsStore(results_file, legacy=legacy_results_file)
+attempt_log = AttemptLog(attempts_dir)
 
 def ensure_base():
     os.makedirs(tests_base, exist_ok=True)
 
+def get_bank():
+    # Índice cargado una vez; luego solo se revalidan los ficheros modificados
+    global _bank
+    if _bank is None:
+        ensure_base()
+        _bank = QuestionBank(tests_base)
+        _bank.refresh()
+    return _bank
+
 def load_sections():
     ensure_base()
-    secs = [d for d in os.listdir(tests_base)
-            if os.path.isdir(os.path.join(tests_base, d))]
-    if not secs:
-        jsons = glob(os.path.join(tests_base, '*.json'))
-        if jsons:
-            secs = ['General']
-    return secs
-
-def get_subject_and_topic(path):
-    base = os.path.basename(path)
-    match = re.match(r'(.+?)_+Tema(\d+)', base, re.IGNORECASE)
-    if match:
-        subject = match.group(1).replace('_', ' ')
-        topic = int(match.group(2))
-        return subject.strip(), topic
-    return None, None
-
-def select_half_questions(half='first', section='General'):
-    all_files = []
-    pattern = os.path.join(tests_base, '*.json') if section == 'General' else os.path.join(tests_base, section, '*.json')
-    for f in glob(pattern):
-        all_files.append((f, section))
-    grouped = {}
-    for f, sec in all_files:
-        subject, topic = get_subject_and_topic(f)
-        if subject is None or topic is None:
-            continue
-        grouped.setdefault(subject, []).append((topic, f, sec))
-    selected_questions = []
-    for subject, lst in grouped.items():
-        lst.sort()
-        mid = len(lst) // 2
-        subset = lst[:mid] if half == 'first' else lst[mid:]
-        for _, fpath, sec in subset:
-            questions = parse_test(fpath)
-            for q in questions:
-                q['section'] = sec
-                q['file'] = fpath
-                selected_questions.append(q)
-    return random.sample(selected_questions, min(40, len(selected_questions)))
-
-def parse_test(path):
+    return list_sections(tests_base)
+
+def draw_exam(section, half=None, n=20, progress=None, seed=None, weights=None, clusters=None):
+    # (versión del banco, preguntas). La versión se lee antes de sortear: si el banco
+    # cambia mientras tanto, el examen queda con la versión vieja y no se reutiliza
+    bank = get_bank(); bank.refresh(section, progress)
+    version = bank.version
+    return version, get_index(bank, section, half).draw(n, seed, weights, clusters)
+
+def select_half_questions(half='first', section='General', progress=None, seed=None, weights=None, clusters=None):
+    return draw_exam(section, half, 40, progress, seed, weights, clusters)[1]
+
+def select_random_questions(section='General', n=20, progress=None, seed=None, weights=None, clusters=None):
+    return draw_exam(section, None, n, progress, seed, weights, clusters)[1]
+
+def load_lesson(path, progress=None):
+    bf = get_bank().file(path)
+    if bf is None:
+        return parse_test(path)
+    return [dict(q, section=bf.section, file=bf.path, qid=qid) for q, qid in zip(bf.questions, bf.qids)]
+
+def miss_weights(section):
+    # Pesos que favorecen las preguntas falladas recientemente (repaso espaciado)
+    def weights(index):
+        miss_qids, miss_times = attempt_log.last_misses(section)
+        return recency_weights(index.qids(), miss_qids, miss_times, time.time())
+    return weights
+
+def dedup_clusters(index):
+    # Grupo de casi duplicados de cada pregunta del índice (dedup.py), para no repetirlas en un examen
+    return get_dedup(get_bank()).cluster_ids(index.qids())
+
+def search_questions(text, section=None, limit=None, progress=None):
+    return get_bank().search(text, section, limit or search_limit)
+
+def copy_test(src, dst, section, progress=None):
+    shutil.copy(src, dst)
+    get_bank().refresh(section, progress)
+
+# Generadores de cada tipo de examen (se ejecutan fuera del hilo de la GUI);
+# devuelven (versión del banco, preguntas)
+EXAM_BUILDERS = {
+    'random20': partial(draw_exam, half=None, n=20),
+    'half_first': partial(draw_exam, half='first', n=40),
+    'half_second': partial(draw_exam, half='second', n=40),
+}
+
+def parse_test(path, parser=None):
     if path.lower().endswith('.json'):
         with open(path, 'r', encoding='utf-8') as f:
             return json.load(f)
+    if (parser or docx_parser) == 'stream':
+        return parse_docx(path, dialect='app')
+    from docx import Document
     doc = Document(path)
     qlist, current = [], None
     for p in doc.paragraphs:
@@ -94,37 +135,63 @@ def parse_test(path):
             for q, a in zip(qlist, answers): q['answer'] = a
     return qlist
 
+def stats_text(st):
+    mean = StatsRollup.mean
+    # Resumen clásico
+    text = f"--- Estadísticas globales ---\n"
+    text += f"Exámenes realizados: {st.count}\n"
+    text += f"Puntuación total acumulada: {st.score}/{st.total}\n"
+    media_global = (st.score / st.total * 100) if st.total else 0
+    text += f"Puntuación media global: {media_global:.2f}%\n"
+
+    # Por fecha
+    text += "\n--- Por fecha ---\n"
+    text += ''.join(f"{fecha}: {st.by_date[fecha][0]} exámenes, media {mean(st.by_date[fecha]):.2f}%\n"
+                    for fecha in sorted(st.by_date))
+
+    # Resumen por tipo de test
+    text += "\n--- Por tipo de test ---\n"
+    for typ, g in st.by_type.items():
+        text += f"{typ}: {g[0]} exámenes, media {mean(g):.2f}%\n"
+    return text
+
+def compute_stats(stats, cols, store, force=False, progress=None):
+    # Fuera del hilo de la GUI: incorpora los exámenes nuevos y prepara texto y series.
+    # Si el fichero se ha reescrito, la tabla se lee en columnas nuevas y sigue
+    # mostrando las anteriores hasta que se cambian en el hilo de la GUI
+    if not store.ends_with(cols.offset, cols.last_id):
+        cols = ExamColumns()
+    first = cols.sync(store)
+    snap = {'cols': cols, 'first': first, 'end': len(cols)}
+    if stats.sync(store) or force:
+        snap.update(text=stats_text(stats), series=chart_series(stats.by_date), types=list(stats.by_type),
+                    type_means=[StatsRollup.mean(g) for g in stats.by_type.values()])
+    return snap
+
 def load_results():
-    if os.path.exists(results_file):
-        with open(results_file,'r',encoding='utf-8') as f:
-            return json.load(f)
-    return {'exams':[]}
+    return results_store.load()
 
 def save_results(data):
-    with open(results_file,'w',encoding='utf-8') as f:
-        json.dump(data,f,indent=2,ensure_ascii=False)
+    results_store.save(data)
+
+def sync_combo(cb, items):
+    # Aplica altas y bajas sin vaciar el combo, así se conserva la selección
+    wanted = set(items)
+    for i in reversed(range(cb.count())):
+        if cb.itemText(i) not in wanted:
+            cb.removeItem(i)
+    present = {cb.itemText(i) for i in range(cb.count())}
+    for i, text in enumerate(items):
+        if text not in present:
+            cb.insertItem(i, text)
 
 def show_review(parent, answers):
     dlg = QtWidgets.QDialog(parent)
     dlg.setWindowTitle('Revisión del Test')
     dlg.resize(600, 400)
     lay = QtWidgets.QVBoxLayout(dlg)
-    html = '<html><body>'
-    for item in answers:
-        q = item['question']
-        corr_txt = item.get('correct_text', '–––')
-        sel_txt = item.get('selected_text', 'Sin responder')
-        corr_letter = item.get('correct_letter')
-        sel_letter = item.get('selected_letter')
-        color_sel = 'green' if sel_letter == corr_letter else 'red'
-        html += f'<p><b>Pregunta:</b> {q}<br>'
-        html += f'<span style="color:green"><b>Correcta:</b> {corr_txt}</span><br>'
-        html += f'<span style="color:{color_sel}"><b>Tu respuesta:</b> {sel_txt}</span></p><hr>'
-    html += '</body></html>'
-    te = QtWidgets.QTextEdit()
-    te.setReadOnly(True)
-    te.setHtml(html)
-    lay.addWidget(te)
+    # Lista modelo/vista: solo se pintan las respuestas visibles
+    lay.addWidget(review_view(answers, dlg))
     btn = QtWidgets.QPushButton('Cerrar')
     btn.clicked.connect(dlg.accept)
     lay.addWidget(btn)
@@ -146,21 +213,41 @@ class TestApp(QtWidgets.QMainWindow):
         super().__init__()
         self.setWindowTitle('Generador de Tests')
         self.resize(1000,700)
-        self.results = load_results()
+        self.stats = None
+        self._stats_task = None
+        self._stats_again = False
+        self._stats_shown = False
+        self._prefetched = {}
+        self._prefetching = set()
+        # cambia al cambiar las opciones del sorteo: los precargados en curso se descartan
+        self._prefetch_gen = 0
+        self._search_hits = []
+        self._search_gen = 0
         self._init_ui()
 
     def _init_ui(self):
         tabs = QtWidgets.QTabWidget()
         tabs.addTab(self._tests_tab(),'Tests')
-        tabs.addTab(self._stats_tab(),'Estadísticas')
+        # La pestaña de estadísticas (matplotlib, numpy, resultados) se construye al abrirla
+        self._stats_holder = QtWidgets.QWidget()
+        QtWidgets.QVBoxLayout(self._stats_holder).setContentsMargins(0, 0, 0, 0)
+        tabs.addTab(self._stats_holder,'Estadísticas')
+        tabs.currentChanged.connect(lambda i: tabs.widget(i) is self._stats_holder and self._ensure_stats())
         self.setCentralWidget(tabs)
 
+    def _ensure_stats(self):
+        if self.stats is None:
+            self.stats = StatsRollup(stats_file)
+            self._stats_holder.layout().addWidget(self._stats_tab())
+            self.show_stats()
+
     def _tests_tab(self):
         # Usa FondoWidget en vez de QWidget
         w = FondoWidget('fondo.png')  # Debe estar en la misma carpeta
         layout = QtWidgets.QVBoxLayout()
         hl = QtWidgets.QHBoxLayout()
         self.section_cb = QtWidgets.QComboBox(); hl.addWidget(self.section_cb)
+        self.section_cb.currentIndexChanged.connect(self._refresh_tests)
         self.test_cb = QtWidgets.QComboBox(); hl.addWidget(self.test_cb)
         btn_load = QtWidgets.QPushButton('Hacer Test'); btn_load.clicked.connect(self.start_lesson)
         hl.addWidget(btn_load)
@@ -179,70 +266,234 @@ class TestApp(QtWidgets.QMainWindow):
         btn_second_half.clicked.connect(lambda: self.start_half_test('second'))
         hl2.addWidget(btn_second_half)
         layout.addLayout(hl2)
+        self.prefetch_chk = QtWidgets.QCheckBox('Precargar exámenes en segundo plano')
+        self.prefetch_chk.setChecked(True)
+        self.prefetch_chk.toggled.connect(self._prefetch)
+        layout.addWidget(self.prefetch_chk)
+        self.weighted_chk = QtWidgets.QCheckBox('Priorizar preguntas falladas recientemente')
+        self.weighted_chk.toggled.connect(self._reset_prefetch)
+        layout.addWidget(self.weighted_chk)
+        self.dedup_chk = QtWidgets.QCheckBox('Evitar preguntas casi duplicadas')
+        self.dedup_chk.toggled.connect(self._reset_prefetch)
+        layout.addWidget(self.dedup_chk)
+        # Búsqueda en todo el banco; con los resultados se puede hacer un examen
+        sl = QtWidgets.QHBoxLayout()
+        self.search_edit = QtWidgets.QLineEdit()
+        self.search_edit.setPlaceholderText('Buscar preguntas (sin importar tildes ni mayúsculas)...')
+        self.search_edit.setClearButtonEnabled(True)
+        sl.addWidget(self.search_edit)
+        self.search_all_chk = QtWidgets.QCheckBox('Todas las secciones'); sl.addWidget(self.search_all_chk)
+        btn_search_exam = QtWidgets.QPushButton('Examen con resultados'); btn_search_exam.clicked.connect(self.start_search_exam)
+        sl.addWidget(btn_search_exam)
+        layout.addLayout(sl)
+        self.search_list = QtWidgets.QListWidget()
+        self.search_list.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.search_list.hide()
+        layout.addWidget(self.search_list)
+        self._search_timer = QtCore.QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(250)
+        self._search_timer.timeout.connect(self.run_search)
+        self.search_edit.textChanged.connect(lambda _: self._search_timer.start())
+        self.search_all_chk.toggled.connect(self.run_search)
+        self.section_cb.currentIndexChanged.connect(self.run_search)
+        # Cambios en tests_json hechos fuera de la app (p. ej. convertir_a_json.py)
+        self.watcher = BankWatcher(get_bank(), self)
+        self.watcher.changed.connect(self._on_bank_changed)
         self._refresh_sections()
         w.setLayout(layout)
         return w
 
     def _stats_tab(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
         w = QtWidgets.QWidget()
         layout = QtWidgets.QVBoxLayout()
         self.stats_txt = QtWidgets.QTextEdit(); self.stats_txt.setReadOnly(True)
         layout.addWidget(self.stats_txt)
-        self.stats_table = QtWidgets.QTableWidget()
-        self.stats_table.setColumnCount(6)
-        self.stats_table.setHorizontalHeaderLabels(['Fecha', 'Sección', 'Tipo', 'Test', 'Aciertos/Total', 'Porcentaje'])
+        fl = QtWidgets.QHBoxLayout()
+        self.filter_sec_cb = QtWidgets.QComboBox(); fl.addWidget(self.filter_sec_cb)
+        self.filter_type_cb = QtWidgets.QComboBox(); fl.addWidget(self.filter_type_cb)
+        self.filter_dates_chk = QtWidgets.QCheckBox('Entre fechas'); fl.addWidget(self.filter_dates_chk)
+        today = QtCore.QDate.currentDate()
+        self.filter_from = QtWidgets.QDateEdit(today.addMonths(-1)); self.filter_from.setCalendarPopup(True)
+        self.filter_to = QtWidgets.QDateEdit(today); self.filter_to.setCalendarPopup(True)
+        fl.addWidget(self.filter_from); fl.addWidget(self.filter_to)
+        for cb in (self.filter_sec_cb, self.filter_type_cb):
+            cb.currentIndexChanged.connect(self._apply_table_filter)
+        self.filter_dates_chk.toggled.connect(self._apply_table_filter)
+        self.filter_from.dateChanged.connect(self._apply_table_filter)
+        self.filter_to.dateChanged.connect(self._apply_table_filter)
+        layout.addLayout(fl)
+        self.exam_cols = ExamColumns()
+        self.table_model = ResultsTableModel(self.exam_cols, self)
+        self.stats_table = QtWidgets.QTableView()
+        self.stats_table.setModel(self.table_model)
+        self.stats_table.setSortingEnabled(True)
+        self.stats_table.sortByColumn(0, QtCore.Qt.AscendingOrder)
+        self.stats_table.horizontalHeader().setStretchLastSection(True)
         layout.addWidget(self.stats_table)
-        self.figure1, self.ax1 = plt.subplots(figsize=(5,2))
+        self.figure1 = Figure(figsize=(5,2)); self.ax1 = self.figure1.add_subplot()
         self.canvas1 = FigureCanvas(self.figure1)
         layout.addWidget(self.canvas1)
-        self.figure2, self.ax2 = plt.subplots(figsize=(5,2))
+        self.figure2 = Figure(figsize=(5,2)); self.ax2 = self.figure2.add_subplot()
         self.canvas2 = FigureCanvas(self.figure2)
         layout.addWidget(self.canvas2)
+        self._init_charts()
+        # matplotlib en la traza opcional (sin efecto si está desactivada)
+        for name in ('figure1', 'figure2'):
+            tracing.patch(getattr(self, name), ['tight_layout'], name, 'matplotlib')
+        for name in ('canvas1', 'canvas2'):
+            tracing.patch(getattr(self, name), ['draw'], name, 'matplotlib')
         btn_layout = QtWidgets.QHBoxLayout()
         btn = QtWidgets.QPushButton('Actualizar')
         btn.clicked.connect(self.show_stats)
         btn_layout.addWidget(btn)
-        btn_export = QtWidgets.QPushButton('Exportar CSV')
-        btn_export.clicked.connect(self.export_csv)
+        btn_export = QtWidgets.QPushButton('Exportar...')
+        btn_export.clicked.connect(self.export_results)
         btn_layout.addWidget(btn_export)
         layout.addLayout(btn_layout)
         w.setLayout(layout)
         return w
 
-    def export_csv(self):
-        exams = self.results.get('exams', [])
-        if not exams:
+    def _init_charts(self):
+        # Los artistas se crean una vez; show_stats solo cambia sus datos
+        from matplotlib import dates as mdates
+        self.line_daily, = self.ax1.plot([], [], marker='o', markersize=3, linestyle='-', color='tab:blue',
+                                         label='Media diaria (%)')
+        # Línea de tendencia polinómica grado 1 (recta)
+        self.line_trend, = self.ax1.plot([], [], color='tab:red', linestyle='--', label='Tendencia')
+        self.ax1.xaxis_date()
+        locator = mdates.AutoDateLocator()
+        self.ax1.xaxis.set_major_locator(locator)
+        self.ax1.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        self.ax1.set_title("Evolución de la puntuación")
+        self.ax1.set_xlabel("Fecha")
+        self.ax1.set_ylabel("Media (%)")
+        self.ax1.set_ylim(0, 105)
+        self.ax1.grid(True)
+        self.ax1.legend()
+        self.type_bars, self._bar_types = None, None
+        self.ax2.set_title('Media por tipo de test')
+        self.ax2.set_xlabel('Tipo de test')
+        self.ax2.set_ylabel('Media (%)')
+        self.ax2.set_ylim(0, 105)
+        self.ax2.grid(axis='y')
+        self.figure1.tight_layout()
+        self.figure2.tight_layout()
+
+    def _refresh_filter_combos(self):
+        cols = self.exam_cols
+        for cb, label, values in ((self.filter_sec_cb, 'Todas las secciones', cols.sections.values),
+                                  (self.filter_type_cb, 'Todos los tipos', cols.types.values)):
+            if cb.count() == len(values) + 1:
+                continue
+            current = cb.currentText()
+            cb.blockSignals(True)
+            cb.clear(); cb.addItem(label); cb.addItems(sorted(values))
+            cb.setCurrentIndex(max(0, cb.findText(current)))
+            cb.blockSignals(False)
+
+    def _table_filter(self):
+        sec = self.filter_sec_cb.currentText() if self.filter_sec_cb.currentIndex() > 0 else None
+        typ = self.filter_type_cb.currentText() if self.filter_type_cb.currentIndex() > 0 else None
+        since = until = None
+        if self.filter_dates_chk.isChecked():
+            since = self.filter_from.date().toPyDate()
+            until = self.filter_to.date().addDays(1).toPyDate()
+        return sec, typ, since, until
+
+    def _apply_table_filter(self):
+        self.table_model.set_filter(*self._table_filter())
+
+    def export_results(self):
+        if not len(self.exam_cols):
             QtWidgets.QMessageBox.warning(self, 'Sin datos', 'No hay exámenes para exportar.')
             return
-        fname, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Guardar CSV', '', 'CSV Files (*.csv)')
+        fname, chosen = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Exportar resultados', '', 'CSV (*.csv);;JSON Lines (*.jsonl);;NumPy (*.npz)')
         if fname:
-            with open(fname, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Fecha', 'Sección', 'Tipo', 'Test', 'Aciertos', 'Total', 'Porcentaje'])
-                for e in exams:
-                    fecha = e.get('date', '')[:19].replace('T', ' ')
-                    sec = e.get('section', 'General')
-                    typ = e.get('type', '')
-                    test = e.get('test', '')
-                    score = e.get('score', 0)
-                    total = e.get('total', 0)
-                    pct = f"{(score/total*100):.2f}%" if total else "-"
-                    writer.writerow([fecha, sec, typ, test, score, total, pct])
-            QtWidgets.QMessageBox.information(self, 'CSV exportado', 'Exportación completada.')
+            # sin extensión conocida, la del tipo elegido en el diálogo
+            if os.path.splitext(fname)[1].lower() not in results_export.FORMATS and '*' in chosen:
+                fname += chosen[chosen.index('*') + 1:chosen.rindex(')')]
+            # Se exporta lo que muestra la tabla: mismos filtros de sección, tipo y fechas
+            sec, typ, since, until = self._table_filter()
+            self._in_background('Exportando resultados...', results_export.export, results_store, fname,
+                                section=sec, typ=typ, since=since, until=until,
+                                on_done=lambda n: QtWidgets.QMessageBox.information(
+                                    self, 'Exportación completada', f'{n} exámenes exportados a {fname}.'))
 
     def _refresh_sections(self):
-        secs = load_sections()
         self.section_cb.blockSignals(True)
-        self.section_cb.clear(); self.section_cb.addItems(secs)
+        sync_combo(self.section_cb, sorted(load_sections()))
         self.section_cb.blockSignals(False)
         self._refresh_tests()
-        self.section_cb.currentIndexChanged.connect(self._refresh_tests)
 
     def _refresh_tests(self):
         sec = self.section_cb.currentText()
-        pattern = os.path.join(tests_base, '*.json') if sec == 'General' else os.path.join(tests_base, sec, '*.json')
-        files = [os.path.basename(f) for f in glob(pattern)]
-        self.test_cb.clear(); self.test_cb.addItems(files)
+        bank = get_bank()
+        # con el watcher al día no hace falta volver a listar la sección
+        if not self.watcher.covers(sec):
+            bank.refresh(sec)
+        sync_combo(self.test_cb, [os.path.basename(bf.path) for bf in bank.files(sec)])
+        self._prefetch()
+
+    def _on_bank_changed(self, sections, sections_changed):
+        for key in [k for k in self._prefetched if k[0] in sections]:
+            del self._prefetched[key]
+        if sections_changed:
+            self._refresh_sections()
+        elif self.section_cb.currentText() in sections:
+            self._refresh_tests()
+        if sections and self.search_edit.text().strip():
+            self.run_search()
+
+    def _in_background(self, label, fn, *args, on_done, **kwargs):
+        dlg = QtWidgets.QProgressDialog(label, 'Cancelar', 0, 0, self)
+        dlg.setWindowModality(QtCore.Qt.WindowModal)
+        dlg.setMinimumDuration(300)
+        def progress(done, total):
+            dlg.setMaximum(total); dlg.setValue(done)
+        def finish(result):
+            dlg.reset(); on_done(result)
+        def fail(msg):
+            dlg.reset(); QtWidgets.QMessageBox.warning(self, 'Error', msg)
+        task = run_task(fn, *args, on_done=finish, on_error=fail, on_progress=progress, **kwargs)
+        dlg.canceled.connect(task.cancel)
+        task.signals.ended.connect(dlg.deleteLater)
+        return task
+
+    def _weights(self, sec):
+        return miss_weights(sec) if self.weighted_chk.isChecked() else None
+
+    def _clusters(self):
+        return dedup_clusters if self.dedup_chk.isChecked() else None
+
+    def _reset_prefetch(self, *_):
+        self._prefetch_gen += 1
+        self._prefetched.clear()
+        self._prefetch()
+
+    def _prefetch(self, *_):
+        # Prepara el siguiente examen de cada tipo para la sección actual
+        sec = self.section_cb.currentText()
+        if not sec or not self.prefetch_chk.isChecked():
+            return
+        gen = self._prefetch_gen
+        for typ, build in EXAM_BUILDERS.items():
+            key = (sec, typ)
+            if key in self._prefetched or key + (gen,) in self._prefetching:
+                continue
+            self._prefetching.add(key + (gen,))
+            seed = random.randrange(2**32)
+            task = run_task(build, sec, seed=seed, weights=self._weights(sec), clusters=self._clusters(),
+                            on_done=lambda res, key=key, seed=seed, gen=gen: self._prefetch_done(key, gen, seed, res))
+            task.signals.ended.connect(lambda key=key, gen=gen: self._prefetching.discard(key + (gen,)))
+
+    def _prefetch_done(self, key, gen, seed, res):
+        # sorteado con opciones que ya no están marcadas: no sirve
+        if gen == self._prefetch_gen:
+            self._prefetched[key] = (res[0], seed, res[1])
 
     def add_section(self):
         name, ok = QtWidgets.QInputDialog.getText(self, 'Nueva Sección', 'Nombre:')
@@ -256,7 +507,8 @@ class TestApp(QtWidgets.QMainWindow):
         src, _ = QtWidgets.QFileDialog.getOpenFileName(self, 'Seleccionar .json', '', 'JSON files (*.json)')
         if src and src.lower().endswith('.json'):
             dst = os.path.join(tests_base, os.path.basename(src)) if sec == 'General' else os.path.join(tests_base, sec, os.path.basename(src))
-            shutil.copy(src, dst); self._refresh_tests()
+            self._in_background('Copiando test...', copy_test, src, dst, sec,
+                                on_done=lambda _: self._refresh_tests())
 
     def start_lesson(self):
         sec = self.section_cb.currentText(); test = self.test_cb.currentText()
@@ -264,152 +516,162 @@ class TestApp(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, 'Error', 'No hay tests en la sección seleccionada.')
             return
         path = os.path.join(tests_base, test) if sec == 'General' else os.path.join(tests_base, sec, test)
-        qs = parse_test(path)
+        def begin(qs):
+            if not qs:
+                QtWidgets.QMessageBox.warning(self, 'Error', f'No se encontraron preguntas en {test}.')
+                return
+            self._conduct(qs, 'lesson', sec, test)
+        self._in_background('Cargando test...', load_lesson, path, on_done=begin)
+
+    def run_search(self, *_):
+        # Las búsquedas van a un hilo (el banco puede estar ocupado reindexando);
+        # solo se muestra la respuesta a la última
+        self._search_gen += 1
+        gen = self._search_gen
+        text = self.search_edit.text().strip()
+        if not text:
+            self._show_hits(gen, [])
+            return
+        sec = None if self.search_all_chk.isChecked() else self.section_cb.currentText()
+        run_task(search_questions, text, sec, on_done=lambda hits: self._show_hits(gen, hits))
+
+    def _show_hits(self, gen, hits):
+        if gen != self._search_gen:
+            return
+        self._search_hits = hits
+        self.search_list.clear()
+        for q in hits:
+            self.search_list.addItem(f"{q.get('question', '')}   —   {q['section']}/{os.path.basename(q['file'])}")
+        self.search_list.setVisible(bool(self.search_edit.text().strip()))
+        self.search_list.setToolTip(f'{len(hits)} resultados (selecciona algunos para un examen solo con ellos)')
+
+    def start_search_exam(self):
+        # Examen con las preguntas seleccionadas o, si no hay selección, con todos los resultados
+        rows = sorted(index.row() for index in self.search_list.selectedIndexes())
+        qs = [self._search_hits[r] for r in rows] if rows else list(self._search_hits)
         if not qs:
-            QtWidgets.QMessageBox.warning(self, 'Error', f'No se encontraron preguntas en {test}.')
+            QtWidgets.QMessageBox.warning(self, 'Error', 'No hay resultados de búsqueda.')
             return
-        self._conduct(qs, 'lesson', sec, test)
+        secs = {q['section'] for q in qs}
+        self._conduct(qs, 'search', secs.pop() if len(secs) == 1 else 'Varias', self.search_edit.text().strip())
 
     def start_random(self):
-        sec = self.section_cb.currentText()
-        pattern = os.path.join(tests_base, '*.json') if sec == 'General' else os.path.join(tests_base, sec, '*.json')
-        all_q = []
-        for f in glob(pattern):
-            for q in parse_test(f):
-                q['section'] = sec
-                all_q.append(q)
-        if not all_q:
-            QtWidgets.QMessageBox.warning(self, 'Error', 'No hay preguntas disponibles en la sección seleccionada.')
-            return
-        sel = random.sample(all_q, min(20, len(all_q)))
-        self._conduct(sel, 'random20', sec, None)
+        self._start_exam('random20', 'No hay preguntas disponibles en la sección seleccionada.')
 
     def start_half_test(self, half):
-        sec = self.section_cb.currentText()
-        sel = select_half_questions(half, sec)
-        if not sel:
-            QtWidgets.QMessageBox.warning(self, 'Error', f'No hay suficientes preguntas en la {half} mitad de los temas de la sección seleccionada.')
-            return
-        self._conduct(sel, f'half_{half}', sec, None)
+        self._start_exam(f'half_{half}', f'No hay suficientes preguntas en la {half} mitad de los temas de la sección seleccionada.')
 
-    def _conduct(self, questions, typ, sec, test):
+    def _start_exam(self, typ, empty_msg):
+        sec = self.section_cb.currentText()
+        # los precargados válidos se sortearon con estas mismas opciones (ver _reset_prefetch)
+        weighted, dedup = self.weighted_chk.isChecked(), self.dedup_chk.isChecked()
+        def begin(sel, seed):
+            if not sel:
+                QtWidgets.QMessageBox.warning(self, 'Error', empty_msg)
+                return
+            self._conduct(sel, typ, sec, None, seed, weighted, dedup)
+        ready = self._prefetched.pop((sec, typ), None)
+        self._prefetch()
+        if ready and ready[0] == get_bank().version:
+            begin(ready[2], ready[1])
+        else:
+            # La semilla se guarda con el resultado: el examen se puede regenerar igual
+            # (salvo los ponderados, que dependen de los fallos registrados hasta ahora)
+            seed = random.randrange(2**32)
+            self._in_background('Preparando examen...', EXAM_BUILDERS[typ], sec, seed=seed, weights=self._weights(sec),
+                                clusters=self._clusters(),
+                                on_done=lambda res: begin(res[1], seed))
+
+    def _conduct(self, questions, typ, sec, test, seed=None, weighted=False, dedup=False):
         dlg = QuestionDialog(questions, self)
         if dlg.exec_():
             ans = dlg.user_answers
             score = sum(1 for a in ans if a.get('selected_letter') == a.get('correct_letter'))
-            self.results['exams'].append({
+            exam = {
                 'type': typ,
                 'section': sec,
                 'test': test,
                 'score': score,
                 'total': len(ans),
                 'date': datetime.now().isoformat(timespec='seconds')
-            })
-            save_results(self.results)
+            }
+            if weighted:
+                # sin semilla: el sorteo no se puede repetir con otro historial de fallos
+                exam['weighted'] = True
+            elif seed is not None:
+                exam['seed'] = seed
+            if dedup:
+                exam['dedup'] = True
+            results_store.append(exam)
+            attempt_log.record(ans)
+            if self.weighted_chk.isChecked():
+                self._reset_prefetch()
             QtWidgets.QMessageBox.information(self, 'Resultados', f'Puntuación: {score}/{len(ans)}')
-            self.show_stats()
+            if self.stats is not None:
+                self.show_stats()
             show_review(self, ans)
 
     def show_stats(self):
-        exams = self.results.get('exams', [])
-        # Resumen clásico
-        by_sec = {}
-        total_c = total_q = 0
-        for e in exams:
-            key = e.get('section', 'General')
-            by_sec.setdefault(key, []).append(e)
-            total_c += e['score']
-            total_q += e['total']
-        text = f"--- Estadísticas globales ---\n"
-        text += f"Exámenes realizados: {len(exams)}\n"
-        text += f"Puntuación total acumulada: {total_c}/{total_q}\n"
-        media_global = (total_c / total_q * 100) if total_q else 0
-        text += f"Puntuación media global: {media_global:.2f}%\n"
-
-        # Por fecha
-        by_date = defaultdict(list)
-        for e in exams:
-            fecha = e.get('date', '')[:10]
-            by_date[fecha].append(e)
-        text += "\n--- Por fecha ---\n"
-        for fecha in sorted(by_date):
-            exs = by_date[fecha]
-            sc = sum(e['score'] for e in exs)
-            tq = sum(e['total'] for e in exs)
-            med = (sc / tq * 100) if tq else 0
-            text += f"{fecha}: {len(exs)} exámenes, media {med:.2f}%\n"
-
-        # Resumen por tipo de test
-        by_type = defaultdict(list)
-        for e in exams:
-            by_type[e.get('type', 'Desconocido')].append(e)
-        text += "\n--- Por tipo de test ---\n"
-        for typ, lst in by_type.items():
-            score = sum(e['score'] for e in lst)
-            total = sum(e['total'] for e in lst)
-            media = (score/total*100) if total else 0
-            text += f"{typ}: {len(lst)} exámenes, media {media:.2f}%\n"
-
-        self.stats_txt.setText(text)
-
-        # Tabla con color
-        self.stats_table.setRowCount(len(exams))
-        for row, e in enumerate(sorted(exams, key=lambda x: x.get('date', ''))):
-            fecha = e.get('date', '')[:19].replace('T', ' ')
-            sec = str(e.get('section', 'General'))
-            typ = str(e.get('type', ''))
-            test = str(e.get('test', ''))
-            score = f"{e['score']}/{e['total']}"
-            percent_val = (e['score']/e['total']*100) if e['total'] else 0
-            percent = f"{percent_val:.2f}%"
-            for col, val in enumerate([fecha, sec, typ, test, score, percent]):
-                item = QtWidgets.QTableWidgetItem(val)
-                if col == 5:
-                    # Colores: verde >=80, amarillo >=60, rojo <60
-                    if percent_val >= 80:
-                        item.setBackground(QtCore.Qt.green)
-                    elif percent_val >= 60:
-                        item.setBackground(QtCore.Qt.yellow)
-                    else:
-                        item.setBackground(QtCore.Qt.red)
-                    item.setTextAlignment(QtCore.Qt.AlignCenter)
-                self.stats_table.setItem(row, col, item)
-        self.stats_table.resizeColumnsToContents()
-
-        # Gráfica evolución diaria con línea de tendencia
-        self.ax1.clear()
-        fechas = sorted(by_date)
-        x = np.arange(len(fechas))
-        medias = [(sum(e['score'] for e in by_date[f]) / sum(e['total'] for e in by_date[f]) * 100)
-                  if sum(e['total'] for e in by_date[f]) else 0 for f in fechas]
-        self.ax1.plot(fechas, medias, marker='o', linestyle='-', color='tab:blue', label='Media diaria (%)')
-        # Línea de tendencia polinómica grado 1 (recta)
-        if len(medias) > 1:
-            z = np.polyfit(x, medias, 1)
-            p = np.poly1d(z)
-            self.ax1.plot(fechas, p(x), color='tab:red', linestyle='--', label='Tendencia')
-        self.ax1.set_title("Evolución diaria de la puntuación")
-        self.ax1.set_xlabel("Fecha")
-        self.ax1.set_ylabel("Media (%)")
-        self.ax1.set_ylim(0, 105)
-        self.ax1.grid(True)
+        # Los exámenes nuevos se leen en segundo plano (tabla, agregados y series
+        # de las gráficas); aquí solo se aplica el resultado
+        if self._stats_task is not None:
+            self._stats_again = True
+            return
+        self._stats_task = run_task(compute_stats, self.stats, self.exam_cols, results_store,
+                                    force=not self._stats_shown, on_done=self._apply_stats)
+        self._stats_task.signals.ended.connect(self._stats_ended)
+
+    def _stats_ended(self):
+        self._stats_task = None
+        if self._stats_again:
+            self._stats_again = False
+            self.show_stats()
+
+    def _apply_stats(self, snap):
+        # Tabla: el modelo pinta solo las filas visibles
+        first_fill = len(self.exam_cols) == 0
+        if snap['cols'] is not self.exam_cols:
+            self.exam_cols = snap['cols']
+            self.table_model.set_columns(self.exam_cols)
+        else:
+            self.table_model.rows_added(snap['first'], snap['end'])
+        self._refresh_filter_combos()
+        if first_fill and len(self.exam_cols):
+            self.stats_table.resizeColumnsToContents()
+        if 'text' not in snap:
+            return
+        from matplotlib import dates as mdates
+        self._stats_shown = True
+        self.stats_txt.setText(snap['text'])
+
+        # Evolución: medias por día, semana o mes según la longitud del historial
+        series = snap['series']
+        x = mdates.date2num(series['x']) if len(series['x']) else []
+        self.line_daily.set_data(x, series['y'])
+        self.line_daily.set_label(f"Media por {series['unit']} (%)")
+        self.line_trend.set_data(x if series['trend'] is not None else [],
+                                 series['trend'] if series['trend'] is not None else [])
+        if len(x):
+            self.ax1.relim()
+            self.ax1.autoscale_view(scaley=False)
         self.ax1.legend()
-        self.figure1.tight_layout()
-        self.canvas1.draw()
-
-        # Gráfica de barras por tipo de test
-        self.ax2.clear()
-        tipos = list(by_type.keys())
-        medias_tipo = [(sum(e['score'] for e in by_type[t]) / sum(e['total'] for e in by_type[t]) * 100)
-                       if sum(e['total'] for e in by_type[t]) else 0 for t in tipos]
-        self.ax2.bar(tipos, medias_tipo, color='tab:green', alpha=0.7)
-        self.ax2.set_title('Media por tipo de test')
-        self.ax2.set_xlabel('Tipo de test')
-        self.ax2.set_ylabel('Media (%)')
-        self.ax2.set_ylim(0, 105)
-        self.ax2.grid(axis='y')
-        self.figure2.tight_layout()
-        self.canvas2.draw()
+        self.canvas1.draw_idle()
+
+        # Barras por tipo de test: se recrean solo si cambian los tipos
+        tipos, medias_tipo = snap['types'], snap['type_means']
+        if tipos == self._bar_types:
+            for bar, h in zip(self.type_bars, medias_tipo):
+                bar.set_height(h)
+        else:
+            if self.type_bars is not None:
+                self.type_bars.remove()
+            pos = range(len(tipos))
+            self.type_bars = self.ax2.bar(pos, medias_tipo, color='tab:green', alpha=0.7)
+            self.ax2.set_xticks(list(pos))
+            self.ax2.set_xticklabels(tipos)
+            self.ax2.set_xlim(-0.5, max(len(tipos), 1) - 0.5)
+            self._bar_types = tipos
+        self.canvas2.draw_idle()
 
 class QuestionDialog(QtWidgets.QDialog):
     def __init__(self, questions, parent=None):
@@ -423,36 +685,53 @@ class QuestionDialog(QtWidgets.QDialog):
         self.opt_layout = QtWidgets.QVBoxLayout(); self.opt_group.setLayout(self.opt_layout)
         self.layout.addWidget(self.opt_group)
         self.radio_group = QtWidgets.QButtonGroup(self); self.radio_group.setExclusive(True)
+        # Botones de opción reutilizados entre preguntas (se crean más solo si hacen falta)
+        self.option_buttons = []; self.letters = []
+        for i in range(4):
+            self._option_button(i)
         self.btn_next = QtWidgets.QPushButton('Siguiente'); self.btn_next.clicked.connect(self.next_q)
         self.layout.addWidget(self.btn_next)
         self._show_question()
 
+    def _option_button(self, i):
+        while len(self.option_buttons) <= i:
+            rb = QtWidgets.QRadioButton()
+            self.radio_group.addButton(rb, len(self.option_buttons)); self.opt_layout.addWidget(rb)
+            self.option_buttons.append(rb)
+        return self.option_buttons[i]
+
     def _show_question(self):
-        q = self.questions[self.idx]; self.lbl.setText(q['question'])
-        for i in reversed(range(self.opt_layout.count())):
-            w = self.opt_layout.itemAt(i).widget(); self.radio_group.removeButton(w)
-            self.opt_layout.removeWidget(w); w.deleteLater()
-        for key, txt in sorted(q['options'].items()):
-            rb = QtWidgets.QRadioButton(f"{key}. {txt}")
-            rb.setAutoExclusive(False); rb.setChecked(False)
-            self.radio_group.addButton(rb); self.opt_layout.addWidget(rb)
-        for b in self.radio_group.buttons():
-            b.toggled.connect(lambda checked, btn=b: btn.setAutoExclusive(True) if checked else None)
+        q = self.questions[self.idx]
+        options = sorted(q['options'].items())
+        self.setUpdatesEnabled(False)
+        self.lbl.setText(q['question'])
+        # sin exclusividad se pueden desmarcar todos: la pregunta empieza sin respuesta
+        self.radio_group.setExclusive(False)
+        for i, (key, txt) in enumerate(options):
+            rb = self._option_button(i)
+            rb.setChecked(False); rb.setText(f"{key}. {txt}"); rb.setVisible(True)
+        for rb in self.option_buttons[len(options):]:
+            rb.setChecked(False); rb.setVisible(False)
+        self.radio_group.setExclusive(True)
+        self.letters = [key for key, _ in options]
         if self.idx == len(self.questions) - 1:
             self.btn_next.setText('Terminar')
+        self.setUpdatesEnabled(True)
 
     def next_q(self):
-        sel_letter = None
-        for b in self.radio_group.buttons():
-            if b.isChecked():
-                sel_letter = b.text()[0]
+        checked = self.radio_group.checkedId()
+        sel_letter = self.letters[checked] if 0 <= checked < len(self.letters) else None
         corr_letter = self.questions[self.idx]['answer']
         sel_text = None
         if sel_letter:
             sel_text = self.questions[self.idx]['options'].get(sel_letter, None)
         corr_text = self.questions[self.idx]['options'].get(corr_letter, None)
+        q = self.questions[self.idx]
         self.user_answers.append({
-            'question': self.questions[self.idx]['question'],
+            'qid': q.get('qid'),
+            'section': q.get('section'),
+            'file': q.get('file'),
+            'question': q['question'],
             'selected_letter': sel_letter,
             'selected_text': sel_text,
             'correct_letter': corr_letter,
@@ -464,6 +743,57 @@ class QuestionDialog(QtWidgets.QDialog):
         else:
             self.accept()
 
+def measure_startup(runs=5):
+    # Tiempo hasta la primera ventana en procesos nuevos (mediana de varias ejecuciones)
+    import subprocess
+    import statistics
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--first-window'],
+                             capture_output=True, text=True, check=True).stdout
+        sample = json.loads(out.strip().splitlines()[-1])
+        sample['process_s'] = time.perf_counter() - t0
+        samples.append(sample)
+    summary = {key: round(statistics.median(s[key] for s in samples), 4)
+               for key in ('import_s', 'first_window_s', 'process_s')}
+    summary['runs'] = runs
+    return summary
+
+def instrument():
+    # Intervalos de la traza opcional (tracing.py): E/S, parseo, resultados y slots de Qt
+    import question_bank
+    module = sys.modules[__name__]
+    tracing.patch(module, ['parse_test', 'parse_docx', 'load_results', 'save_results', 'load_lesson',
+                           'copy_test', 'show_review', 'compute_stats', 'dedup_clusters', 'search_questions'], 'app')
+    for key, fn in EXAM_BUILDERS.items():
+        EXAM_BUILDERS[key] = tracing.traced(fn, f'exam.{key}')
+    tracing.patch(question_bank, ['glob'], cat='io')
+    tracing.patch(QuestionBank, ['refresh', '_index_file', 'search'])
+    tracing.patch(ResultsStore, ['append_many', 'load', 'save', 'compact'], cat='io')
+    tracing.patch(StatsRollup, ['sync'])
+    tracing.patch(BankWatcher, ['_flush'], cat='io', slot=True)
+    tracing.patch(AttemptLog, ['record'], cat='io')
+    tracing.patch(ResultsTableModel, ['refresh', 'set_filter', 'sort', 'fetchMore'], cat='qt', slot=True)
+    tracing.patch(TestApp, ['start_lesson', 'start_random', 'start_half_test', 'add_section', 'add_test',
+                            'show_stats', 'export_results', '_ensure_stats', '_refresh_sections', '_refresh_tests',
+                            '_apply_table_filter', '_refresh_filter_combos', '_prefetch', '_reset_prefetch',
+                            '_conduct', '_on_bank_changed', '_apply_stats', 'run_search', 'start_search_exam'],
+                  cat='qt', slot=True)
+    tracing.patch(QuestionDialog, ['__init__', '_show_question', 'next_q'], cat='qt', slot=True)
+
 if __name__ == '__main__':
+    if '--startup-time' in sys.argv:
+        print(json.dumps(measure_startup())); sys.exit(0)
+    if tracing.from_env():
+        instrument()
+    imported = time.perf_counter()
     app = QtWidgets.QApplication(sys.argv)
-    win = TestApp(); win.show(); sys.exit(app.exec_())
+    win = TestApp(); win.show()
+    if '--first-window' in sys.argv:
+        # Se dispara en la primera vuelta del bucle de eventos, con la ventana ya pintada
+        def report():
+            print(json.dumps({'import_s': imported - _started, 'first_window_s': time.perf_counter() - _started}))
+            app.quit()
+        QtCore.QTimer.singleShot(0, report)
+    sys.exit(app.exec_())
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import threading
+from question_bank import get_subject_and_topic
+from results_store import file_lock
+
+# Registro de respuestas pregunta a pregunta en columnas binarias que se leen
+# con np.memmap. La columna q es un número denso de pregunta; questions.jsonl
+# traduce cada número a su id estable del banco y a sus datos (sección, tema...).
+COLUMNS = {'q': '<i4', 'ts': '<i8', 'selected': 'i1', 'correct': 'i1'}
+LETTERS = {'A': 0, 'B': 1, 'C': 2, 'D': 3}
+
+def _code(letter):
+    return LETTERS.get(letter, -1)
+
+class AttemptLog:
+    def __init__(self, path='attempts'):
+        self.path = path
+        self.lock_path = os.path.join(path, '.lock')
+        self.meta_path = os.path.join(path, 'questions.jsonl')
+        self.meta = []
+        self.numbers = {}
+        self._meta_offset = 0
+        self._cols = None
+        self._n = -1
+        self._lock = threading.RLock()
+
+    def _col_path(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    def _sync_meta(self):
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, 'rb') as f:
+            f.seek(self._meta_offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._meta_offset += len(line)
+                m = json.loads(line)
+                self.numbers[m['qid']] = len(self.meta)
+                self.meta.append(m)
+
+    def __len__(self):
+        import numpy as np
+        sizes = []
+        for name, dtype in COLUMNS.items():
+            try:
+                sizes.append(os.path.getsize(self._col_path(name)) // np.dtype(dtype).itemsize)
+            except OSError:
+                return 0
+        # si una escritura se cortó, las columnas más largas se ignoran
+        return min(sizes)
+
+    def record(self, answers, ts=None):
+        import numpy as np
+        answers = [a for a in answers if a.get('qid') is not None]
+        if not answers:
+            return
+        ts = int(ts if ts is not None else time.time())
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock, file_lock(self.lock_path):
+            self._sync_meta()
+            n = len(self)
+            new_meta = []
+            for a in answers:
+                if a['qid'] not in self.numbers:
+                    subject, topic = get_subject_and_topic(a.get('file') or '')
+                    m = {'qid': a['qid'], 'section': a.get('section'), 'file': os.path.basename(a.get('file') or ''),
+                         'subject': subject, 'topic': topic, 'question': a.get('question')}
+                    self.numbers[m['qid']] = len(self.meta)
+                    self.meta.append(m)
+                    new_meta.append(m)
+            if new_meta:
+                with open(self.meta_path, 'ab') as f:
+                    f.write(b''.join((json.dumps(m, ensure_ascii=False) + '\n').encode('utf-8') for m in new_meta))
+                    f.flush(); os.fsync(f.fileno())
+                self._meta_offset = os.path.getsize(self.meta_path)
+            data = {
+                'q': [self.numbers[a['qid']] for a in answers],
+                'ts': [ts] * len(answers),
+                'selected': [_code(a.get('selected_letter')) for a in answers],
+                'correct': [_code(a.get('correct_letter')) for a in answers],
+            }
+            for name, dtype in COLUMNS.items():
+                with open(self._col_path(name), 'r+b' if os.path.exists(self._col_path(name)) else 'wb') as f:
+                    # se recorta lo que sobre de una escritura cortada antes de añadir
+                    size = n * np.dtype(dtype).itemsize
+                    if f.seek(0, os.SEEK_END) != size:
+                        f.truncate(size)
+                        f.seek(size)
+                    f.write(np.asarray(data[name], dtype=dtype).tobytes())
+                    f.flush(); os.fsync(f.fileno())
+
+    def columns(self):
+        # Vistas memmap de solo lectura; se reabren solo si el log ha crecido
+        import numpy as np
+        with self._lock:
+            return self._columns(np)
+
+    def _snapshot(self):
+        # Columnas y una copia de meta tomadas juntas: record() añade a meta desde otro hilo
+        import numpy as np
+        with self._lock:
+            return self._columns(np), list(self.meta)
+
+    def _columns(self, np):
+        n = len(self)
+        if n != self._n:
+            self._sync_meta()
+            if n == 0:
+                self._cols = {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+            else:
+                self._cols = {name: np.memmap(self._col_path(name), dtype=dtype, mode='r', shape=(n,))
+                              for name, dtype in COLUMNS.items()}
+            self._n = n
+        return self._cols
+
+    def _mask(self, cols, meta, section=None, since=None):
+        import numpy as np
+        mask = np.ones(len(cols['q']), dtype=bool)
+        if since is not None:
+            mask &= cols['ts'] >= since
+        if section is not None:
+            in_section = np.fromiter((m['section'] == section for m in meta), dtype=bool, count=len(meta))
+            mask &= in_section[cols['q']]
+        return mask
+
+    def most_failed(self, section=None, limit=50, since=None):
+        import numpy as np
+        cols, meta = self._snapshot()
+        mask = self._mask(cols, meta, section, since)
+        q = cols['q'][mask]
+        wrong = cols['selected'][mask] != cols['correct'][mask]
+        fails = np.bincount(q[wrong], minlength=len(meta))
+        tries = np.bincount(q, minlength=len(meta))
+        k = min(limit, int((fails > 0).sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(-fails, k - 1)[:k]
+        top = top[np.lexsort((-tries[top], -fails[top]))]
+        return [dict(meta[i], fails=int(fails[i]), attempts=int(tries[i])) for i in top]
+
+    def accuracy_by_topic(self, days=30, section=None, now=None):
+        import numpy as np
+        cols, meta = self._snapshot()
+        since = (now if now is not None else time.time()) - days * 86400
+        mask = self._mask(cols, meta, section, since)
+        keys, topic_of = {}, np.empty(len(meta), dtype=np.int64)
+        for i, m in enumerate(meta):
+            topic_of[i] = keys.setdefault((m['section'], m['subject'], m['topic']), len(keys))
+        t = topic_of[cols['q'][mask]]
+        right = cols['selected'][mask] == cols['correct'][mask]
+        tries = np.bincount(t, minlength=len(keys))
+        hits = np.bincount(t[right], minlength=len(keys))
+        return [{'section': sec, 'subject': subject, 'topic': topic, 'attempts': int(tries[k]),
+                 'accuracy': float(hits[k] / tries[k] * 100)}
+                for (sec, subject, topic), k in keys.items() if tries[k]]
+
+    def last_misses(self, section=None):
+        # (ids del banco, instantes) de cada fallo, para sampling.recency_weights
+        import numpy as np
+        cols, meta = self._snapshot()
+        mask = self._mask(cols, meta, section) & (cols['selected'] != cols['correct'])
+        qids = np.fromiter((m['qid'] for m in meta), dtype=np.int64, count=len(meta))
+        return qids[cols['q'][mask]], np.asarray(cols['ts'][mask])
@@ -0,0 +1,108 @@
+import os
+import sys
+from glob import glob
+from PyQt5 import QtCore
+from question_bank import list_sections, section_pattern
+
+# Vigila tests_json (carpeta base, carpetas de sección y cada .json) y aplica al
+# banco solo los ficheros que cambian. Los avisos se agrupan unos milisegundos:
+# un convertir_a_json.py escribe decenas de ficheros seguidos.
+
+class BankWatcher(QtCore.QObject):
+    # (secciones con ficheros cambiados, si ha cambiado la lista de secciones)
+    changed = QtCore.pyqtSignal(set, bool)
+
+    def __init__(self, bank, parent=None, delay=200):
+        super().__init__(parent)
+        self.bank = bank
+        self.base = os.path.normpath(bank.base)
+        self.sections = []
+        # secciones cuyos ficheros no se han podido vigilar (límite de inotify...)
+        self.unwatched = set()
+        self._dirs, self._files = set(), set()
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._on_dir)
+        self.watcher.fileChanged.connect(self._on_file)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._flush)
+        self._watch(self.base)
+        self._set_sections(list_sections(self.base))
+
+    def covers(self, section):
+        return section in self.sections and section not in self.unwatched
+
+    def _section_dir(self, section):
+        return self.base if section == 'General' else os.path.join(self.base, section)
+
+    def _dir_section(self, d):
+        return 'General' if d == self.base else os.path.basename(d)
+
+    def _watch(self, *paths):
+        # True si todo queda vigilado
+        watched = set(self.watcher.files()) | set(self.watcher.directories())
+        paths = [p for p in paths if p not in watched]
+        return not paths or not self.watcher.addPaths(paths)
+
+    def _set_sections(self, sections):
+        old = set(self.sections)
+        self.sections = sorted(sections)
+        for sec in old - set(sections):
+            if sec != 'General':
+                self.watcher.removePath(self._section_dir(sec))
+            self.unwatched.discard(sec)
+        for sec in set(sections) - old:
+            if not self._watch(self._section_dir(sec), *(bf.path for bf in self.bank.files(sec))):
+                self.unwatched.add(sec)
+
+    def _on_dir(self, path):
+        self._dirs.add(os.path.normpath(path))
+        self._timer.start()
+
+    def _on_file(self, path):
+        self._files.add(path)
+        self._timer.start()
+
+    def _apply(self, section, fn, *args):
+        # Un error en una sección no debe salir del slot (PyQt aborta el proceso):
+        # se avisa y se siguen aplicando las demás
+        try:
+            return fn(*args)
+        except Exception as exc:
+            print(f'Error al actualizar la sección {section}: {exc}', file=sys.stderr)
+            return set()
+
+    def _flush(self):
+        dirs, files = self._dirs, self._files
+        self._dirs, self._files = set(), set()
+        sections_changed = False
+        changed, touched = set(), {}
+        if self.base in dirs:
+            sections = sorted(list_sections(self.base)) if os.path.isdir(self.base) else []
+            if sections != self.sections:
+                sections_changed = True
+                for sec in set(sections) ^ set(self.sections):
+                    # sección nueva o borrada: se indexa o se vacía entera
+                    if self._apply(sec, self.bank.refresh, sec):
+                        changed.add(sec)
+                self._set_sections(sections)
+        for d in dirs:
+            sec = self._dir_section(d)
+            if sec in self.sections:
+                # altas y bajas: diferencia entre el listado y lo que ya hay en el banco
+                listing = set(glob(section_pattern(self.bank.base, sec)))
+                known = {bf.path for bf in self.bank.files(sec)}
+                touched.setdefault(sec, set()).update(listing ^ known)
+        for path in files:
+            sec = self._dir_section(os.path.normpath(os.path.dirname(path)))
+            if sec in self.sections:
+                touched.setdefault(sec, set()).add(path)
+        for sec, paths in touched.items():
+            if paths and self._apply(sec, self.bank.update, sec, paths):
+                changed.add(sec)
+            # un fichero reemplazado (os.replace) deja de estar vigilado: se vuelve a añadir
+            if not self._watch(*(bf.path for bf in self.bank.files(sec))):
+                self.unwatched.add(sec)
+        if changed or sections_changed:
+            self.changed.emit(changed, sections_changed)
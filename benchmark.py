@@ -0,0 +1,287 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from contextlib import redirect_stdout
+
+# Benchmarks de los caminos críticos sobre un corpus sintético (banco de
+# preguntas en .docx/.json e historial de exámenes). La salida es JSON para
+# poder comparar ejecuciones entre commits:
+#   python benchmark.py --out antes.json
+#   python benchmark.py --compare antes.json
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+WORDS = ('red', 'protocolo', 'proceso', 'memoria', 'sistema', 'nodo', 'paquete', 'servidor', 'cliente',
+         'capa', 'enlace', 'dirección', 'tabla', 'núcleo', 'fichero', 'usuario', 'permiso', 'señal',
+         'hilo', 'cola', 'latencia', 'ancho', 'banda', 'seguridad', 'cifrado', 'clave', 'nube', 'dato',
+         'disco', 'bloque', 'tiempo', 'real', 'virtual', 'física', 'lógica', 'puerto', 'ruta', 'tráfico')
+TYPES = ('Aleatorio 20', 'Mitad 1', 'Mitad 2', 'Lección')
+
+def _sentence(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+def make_question(rng):
+    options = {label: _sentence(rng, rng.randint(3, 10)).capitalize() for label in 'ABCD'}
+    return {'question': '¿' + _sentence(rng, rng.randint(6, 14)).capitalize() + '?',
+            'options': options, 'answer': rng.choice('ABCD')}
+
+def make_corpus(workdir, sections=2, topics=500, questions=40, docx=True, seed=0):
+    # tests/<sección>/*.docx y tests_json/<sección>/*.json con las mismas preguntas
+    from generar_examenes import write_docx
+    rng = random.Random(seed)
+    for s in range(1, sections + 1):
+        sec = f'Seccion{s}'
+        os.makedirs(os.path.join(workdir, 'tests', sec), exist_ok=True)
+        os.makedirs(os.path.join(workdir, 'tests_json', sec), exist_ok=True)
+        for t in range(1, topics + 1):
+            # 10 asignaturas por sección, para que el reparto por mitades tenga sentido
+            name = f'Asignatura{t % 10}_Tema{t}'
+            qs = [make_question(rng) for _ in range(questions)]
+            with open(os.path.join(workdir, 'tests_json', sec, name + '.json'), 'w', encoding='utf-8') as f:
+                json.dump(qs, f, indent=2, ensure_ascii=False)
+            if docx:
+                body = []
+                for q in qs:
+                    body.append(q['question'])
+                    body.extend(f'{label}) {text}' for label, text in sorted(q['options'].items()))
+                    body.append(f"Respuesta: {q['answer']}")
+                write_docx(os.path.join(workdir, 'tests', sec, name + '.docx'), f'Tema {t}', body)
+
+def make_exam(rng, i, n, sections, now):
+    total = rng.choice((20, 40))
+    # n exámenes repartidos en los últimos tres años
+    ts = now - (n - i) * (3 * 365 * 86400 // max(n, 1))
+    return {'type': rng.choice(TYPES), 'section': f'Seccion{rng.randint(1, sections)}',
+            'test': f'Asignatura{rng.randint(0, 9)}_Tema{rng.randint(1, 500)}.json',
+            'score': rng.randint(0, total), 'total': total,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(ts))}
+
+def make_history(path, exams, sections=2, seed=0, legacy=False, chunk=50000):
+    from results_store import ResultsStore
+    rng = random.Random(seed)
+    now = int(time.time())
+    if legacy:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'exams': [make_exam(rng, i, exams, sections, now) for i in range(exams)]}, f, ensure_ascii=False)
+        return
+    if os.path.exists(path):
+        os.remove(path)
+    # sin compactación: se escribe por bloques para no tener todo el historial en memoria
+    store = ResultsStore(path, compact_every=0)
+    for start in range(0, exams, chunk):
+        store.append_many([make_exam(rng, i, exams, sections, now) for i in range(start, min(exams, start + chunk))])
+
+def measure(fn, repeat=5, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {'median_s': round(statistics.median(samples), 6), 'min_s': round(min(samples), 6), 'runs': repeat}
+
+def _quiet(fn):
+    def run():
+        with redirect_stdout(io.StringIO()):
+            return fn()
+    return run
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def run_benchmarks(args, only=None):
+    # Se ejecuta con el directorio de trabajo en el corpus: las rutas relativas
+    # de Test_Generator y convertir_a_json apuntan a él
+    import Test_Generator as tg
+    import convertir_a_json as conv
+    from question_bank import DB_NAME
+    from stats_engine import StatsRollup, chart_series
+    from dedup import DedupIndex
+    import exam_server
+    results = {}
+    sections = [f'Seccion{s}' for s in range(1, args.sections + 1)]
+    rng = random.Random(args.seed)
+
+    def bench(name, fn, repeat=None, setup=None, **extra):
+        if only and name not in only:
+            return
+        print(f'· {name}', file=sys.stderr)
+        results[name] = dict(measure(fn, repeat or args.repeat, setup), **extra)
+
+    json_files = sorted(os.path.join('tests_json', sec, f) for sec in sections
+                        for f in os.listdir(os.path.join('tests_json', sec)))
+    sample = random.Random(args.seed).sample(json_files, min(args.sample, len(json_files)))
+    bench('parse_test_json', lambda: [tg.parse_test(p) for p in sample], files=len(sample))
+    if not args.no_docx:
+        docx_sample = [os.path.join('tests', *p.split(os.sep)[1:])[:-5] + '.docx' for p in sample]
+        bench('parse_test_docx', lambda: [tg.parse_test(p, 'docx') for p in docx_sample], files=len(docx_sample))
+        bench('parse_test_docx_stream', lambda: [tg.parse_test(p, 'stream') for p in docx_sample],
+              files=len(docx_sample))
+        for parser in ('docx', 'stream'):
+            bench(f'convert_all_cold_{parser}', _quiet(lambda: conv.convert_all(force=True, jobs=args.jobs, parser=parser)),
+                  repeat=args.heavy_repeat, files=len(json_files), jobs=args.jobs or os.cpu_count())
+        bench('convert_all_warm', _quiet(lambda: conv.convert_all(jobs=args.jobs, parser='stream')), files=len(json_files))
+
+    db_path = os.path.join('tests_json', DB_NAME)
+
+    def cold_bank():
+        if tg._bank is not None:
+            tg._bank.close()
+        tg._bank = None
+        _remove(db_path)
+    bench('bank_refresh_cold', tg.get_bank, repeat=args.heavy_repeat, setup=cold_bank, files=len(json_files))
+    bench('bank_refresh_warm', lambda: tg.get_bank().refresh(), files=len(json_files))
+    seeds = iter(range(10 ** 9))
+    bench('select_half_questions', lambda: tg.select_half_questions('first', sections[0], seed=next(seeds)))
+    bench('select_random_questions', lambda: tg.select_random_questions(sections[0], 20, seed=next(seeds)))
+    # Búsqueda de texto: dos palabras del vocabulario, la segunda a medias (prefijo)
+    queries = [f'{rng.choice(WORDS)} {rng.choice(WORDS)[:4]}' for _ in range(20)]
+    bench('search_questions', lambda: [tg.search_questions(q) for q in queries], queries=len(queries))
+    # Casi duplicados: índice MinHash completo y sorteo evitando repetir grupo
+    questions = sum(len(bf.questions) for sec in sections for bf in tg.get_bank().files(sec))
+    bench('dedup_index_cold', lambda: DedupIndex().build(tg.get_bank()), repeat=args.heavy_repeat, questions=questions)
+    bench('select_random_questions_dedup',
+          lambda: tg.select_random_questions(sections[0], 20, seed=next(seeds), clusters=tg.dedup_clusters))
+
+    # Historial: migración desde el results.json antiguo, carga, guardado completo,
+    # añadir un examen y agregados de la pestaña de estadísticas
+    pristine = 'results.pristine.jsonl'
+    if not os.path.exists(pristine):
+        make_history(pristine, args.exams, args.sections, args.seed)
+    legacy = 'results.pristine.json'
+    if (not only or 'results_migrate' in only) and not os.path.exists(legacy):
+        make_history(legacy, args.exams, args.sections, args.seed, legacy=True)
+
+    def fresh_legacy():
+        _remove(tg.results_file, tg.results_file + '.lock')
+        shutil.copy(legacy, tg.legacy_results_file)
+    bench('results_migrate', tg.load_results, repeat=args.heavy_repeat, setup=fresh_legacy, exams=args.exams)
+    _remove(tg.legacy_results_file + '.migrated')
+    shutil.copy(pristine, tg.results_file)
+    bench('load_results', tg.load_results, repeat=args.heavy_repeat, exams=args.exams)
+    if not only or 'save_results' in only:
+        data = tg.load_results()
+        bench('save_results', lambda: tg.save_results(data), repeat=args.heavy_repeat, exams=args.exams)
+        del data
+    now = int(time.time())
+    bench('results_append', lambda: tg.results_store.append(make_exam(rng, 0, 1, args.sections, now)),
+          exams=args.exams)
+    bench('stats_sync_cold', lambda: StatsRollup(tg.stats_file).sync(tg.results_store),
+          repeat=args.heavy_repeat, setup=lambda: _remove(tg.stats_file), exams=args.exams)
+    rollup = StatsRollup(tg.stats_file)
+    rollup.sync(tg.results_store)
+    bench('stats_sync_incremental', lambda: rollup.sync(tg.results_store),
+          setup=lambda: tg.results_store.append(make_exam(rng, 0, 1, args.sections, now)), exams=args.exams)
+    bench('chart_series', lambda: chart_series(rollup.by_date), days=len(rollup.by_date))
+
+    # Servidor de exámenes: N alumnos a la vez piden el mismo examen y entregan
+    def classroom():
+        workdir = os.path.abspath('exam_server_run')
+        shutil.rmtree(workdir, ignore_errors=True)
+        report = asyncio.run(exam_server.simulate_local(tg.get_bank(), args.students, sections[0],
+                                                        seed=args.seed, workdir=workdir))
+        if report['errors']:
+            raise RuntimeError(report['first_error'])
+    bench('exam_server', classroom, repeat=args.heavy_repeat, students=args.students)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(old, new):
+    # Tabla legible por stderr; la salida estándar queda solo para el JSON
+    print(f"\n{'benchmark':<28}{'antes (s)':>12}{'ahora (s)':>12}{'ratio':>8}", file=sys.stderr)
+    for name, r in new['results'].items():
+        before = old.get('results', {}).get(name)
+        if not before:
+            print(f"{name:<28}{'–':>12}{r['median_s']:>12.4f}{'':>8}", file=sys.stderr)
+            continue
+        ratio = r['median_s'] / before['median_s'] if before['median_s'] else float('inf')
+        print(f"{name:<28}{before['median_s']:>12.4f}{r['median_s']:>12.4f}{ratio:>7.2f}x", file=sys.stderr)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Mide los caminos críticos sobre un corpus sintético y emite JSON')
+    ap.add_argument('--sections', type=int, default=2, help='secciones del banco sintético')
+    ap.add_argument('--topics', type=int, default=500, help='temas (ficheros) por sección')
+    ap.add_argument('--questions', type=int, default=40, help='preguntas por tema')
+    ap.add_argument('--exams', type=int, default=100000, help='exámenes en el historial sintético (hasta 1M)')
+    ap.add_argument('--sample', type=int, default=200, help='ficheros que se parsean en los benchmarks de parse_test')
+    ap.add_argument('--repeat', type=int, default=5, help='repeticiones de los benchmarks rápidos')
+    ap.add_argument('--heavy-repeat', type=int, default=1, help='repeticiones de los benchmarks costosos')
+    ap.add_argument('--jobs', '-j', type=int, default=None, help='procesos para convert_all')
+    ap.add_argument('--seed', type=int, default=0, help='semilla del corpus')
+    ap.add_argument('--no-docx', action='store_true', help='sin .docx: omite parse_test_docx y convert_all')
+    ap.add_argument('--students', type=int, default=300, help='alumnos simultáneos en la prueba del servidor de exámenes')
+    ap.add_argument('--only', default=None, help='benchmarks a ejecutar, separados por comas')
+    ap.add_argument('--workdir', default=None, help='carpeta del corpus; se reutiliza si los parámetros coinciden')
+    ap.add_argument('--out', default=None, help='fichero donde guardar el JSON')
+    ap.add_argument('--compare', default=None, help='JSON de una ejecución anterior con el que comparar')
+    args = ap.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='bench_'))
+    corpus = {k: getattr(args, k) for k in ('sections', 'topics', 'questions', 'exams', 'seed', 'no_docx')}
+    marker = os.path.join(workdir, 'corpus.json')
+    try:
+        with open(marker, 'r', encoding='utf-8') as f:
+            reuse = json.load(f) == corpus
+    except (OSError, ValueError):
+        reuse = False
+    if not reuse:
+        for d in ('tests', 'tests_json'):
+            shutil.rmtree(os.path.join(workdir, d), ignore_errors=True)
+        _remove(*(os.path.join(workdir, f) for f in ('results.pristine.jsonl', 'results.pristine.json')))
+        print(f'Generando corpus en {workdir}...', file=sys.stderr)
+        t0 = time.perf_counter()
+        make_corpus(workdir, args.sections, args.topics, args.questions, not args.no_docx, args.seed)
+        print(f'  {time.perf_counter() - t0:.1f}s', file=sys.stderr)
+        with open(marker, 'w', encoding='utf-8') as f:
+            json.dump(corpus, f)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        only = set(args.only.split(',')) if args.only else None
+        results = run_benchmarks(args, only)
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'corpus': corpus,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,16 +1,27 @@
 import os
 import json
 import re
+import time
+import hashlib
+import argparse
 from glob import glob
-from docx import Document
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from docx_stream import parse_docx
 
 # Carpeta donde están tus .docx
 INPUT_DIR = './tests'
 # Carpeta donde volcar los .json
 OUTPUT_DIR = './tests_json'
+# Hashes de los .docx ya convertidos (para saltar los que no cambian)
+MANIFEST = os.path.join(OUTPUT_DIR, '.convert_manifest.json')
+# Backend de lectura de .docx: 'docx' (python-docx) o 'stream' (docx_stream)
+PARSER = os.environ.get('TEST_DOCX_PARSER', 'docx')
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def parse_test(path):
+def parse_test(path, parser=None):
+    if (parser or PARSER) == 'stream':
+        return parse_docx(path, dialect='convert')
+    from docx import Document
     doc = Document(path)
     preguntas = []
     actual = None
@@ -38,17 +49,117 @@ def parse_test(path):
         preguntas.append(actual)
     return preguntas
 
-def convert_all():
-    for section in os.listdir(INPUT_DIR):
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_manifest():
+    try:
+        with open(MANIFEST, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest):
+    tmp = MANIFEST + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, MANIFEST)
+
+def convert_one(docx, out_path, parser=None):
+    start = time.perf_counter()
+    qlist = parse_test(docx, parser)
+    tmp = out_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(qlist, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, out_path)
+    return len(qlist), time.perf_counter() - start
+
+def find_sources():
+    for section in sorted(os.listdir(INPUT_DIR)):
         sec_path = os.path.join(INPUT_DIR, section)
         if not os.path.isdir(sec_path): continue
-        for docx in glob(os.path.join(sec_path, '*.docx')):
-            qlist = parse_test(docx)
+        for docx in sorted(glob(os.path.join(sec_path, '*.docx'))):
             name = os.path.splitext(os.path.basename(docx))[0] + '.json'
-            out_path = os.path.join(OUTPUT_DIR, section + '__' + name)
-            with open(out_path, 'w', encoding='utf-8') as f:
-                json.dump(qlist, f, indent=2, ensure_ascii=False)
-            print(f'→ {docx}  →  {out_path}')
+            yield docx, os.path.join(OUTPUT_DIR, section + '__' + name)
+
+def convert_all(force=False, jobs=None, parser=None):
+    start = time.perf_counter()
+    old = {} if force else load_manifest()
+    manifest, pending = {}, []
+    skipped = 0
+    for docx, out_path in find_sources():
+        st = os.stat(docx)
+        entry = old.get(docx, {})
+        # mismo mtime y tamaño: se reutiliza el hash sin releer el fichero
+        if entry.get('mtime_ns') == st.st_mtime_ns and entry.get('size') == st.st_size:
+            digest = entry['sha256']
+        else:
+            digest = file_hash(docx)
+        record = {'sha256': digest, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'output': out_path}
+        if entry.get('sha256') == digest and os.path.exists(out_path):
+            manifest[docx] = record
+            skipped += 1
+            continue
+        pending.append((docx, out_path, record))
+
+    converted = failed = 0
+    parse_time = 0.0
+
+    def done(docx, out_path, record, result=None, error=None):
+        nonlocal converted, failed, parse_time
+        if error is not None:
+            failed += 1
+            print(f'✗ {docx}: {error}')
+            return
+        nq, elapsed = result
+        converted += 1
+        parse_time += elapsed
+        manifest[docx] = record
+        print(f'→ {docx}  →  {out_path}  ({nq} preguntas, {elapsed:.2f}s)')
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(pending) <= 1:
+        for docx, out_path, record in pending:
+            try:
+                done(docx, out_path, record, convert_one(docx, out_path, parser))
+            except Exception as exc:
+                done(docx, out_path, record, error=exc)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(convert_one, docx, out_path, parser): (docx, out_path, record)
+                       for docx, out_path, record in pending}
+            for fut in as_completed(futures):
+                try:
+                    done(*futures[fut], fut.result())
+                except Exception as exc:
+                    done(*futures[fut], error=exc)
+    save_manifest(manifest)
+
+    summary = {
+        'converted': converted,
+        'skipped': skipped,
+        'failed': failed,
+        'jobs': jobs,
+        'parse_seconds': round(parse_time, 3),
+        'wall_seconds': round(time.perf_counter() - start, 3),
+    }
+    print(f"Convertidos: {converted}  Sin cambios: {skipped}  Fallidos: {failed}  "
+          f"({summary['wall_seconds']:.2f}s total, {summary['parse_seconds']:.2f}s de parseo, {jobs} procesos)")
+    return summary
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Convierte los .docx de tests/ a .json en tests_json/')
+    ap.add_argument('--force', action='store_true', help='reconvierte todo aunque no haya cambios')
+    ap.add_argument('--jobs', '-j', type=int, default=None, help='procesos en paralelo (por defecto, todos los núcleos)')
+    ap.add_argument('--parser', choices=['docx', 'stream'], default=PARSER,
+                    help='lector de .docx: python-docx o streaming del XML (por defecto, $TEST_DOCX_PARSER o docx)')
+    args = ap.parse_args(argv)
+    summary = convert_all(force=args.force, jobs=args.jobs, parser=args.parser)
+    return 1 if summary['failed'] else 0
 
 if __name__ == '__main__':
-    convert_all()
+    raise SystemExit(main())
@@ -0,0 +1,205 @@
+import re
+import json
+import weakref
+import argparse
+import threading
+import unicodedata
+
+# Detección de preguntas casi duplicadas en todo el banco: shingles de
+# caracteres sobre pregunta + opciones normalizadas, firmas MinHash y LSH por
+# bandas. Solo se comparan las preguntas que caen en el mismo cubo, así que el
+# coste crece de forma casi lineal con el tamaño del banco.
+NUM_PERM = 64
+BANDS, ROWS = 16, 4
+SHINGLE = 5
+THRESHOLD = 0.7
+CHUNK = 4096
+
+_numbering = re.compile(r'^\s*\d+\s*[\.\)\-:]+\s*')
+_non_word = re.compile(rb'[^a-z0-9]+')
+
+def normalize(text):
+    # sin tildes (NFKD + ASCII: "ñ" -> "n"), mayúsculas ni puntuación
+    text = unicodedata.normalize('NFKD', text.lower()).encode('ascii', 'ignore')
+    return _non_word.sub(b' ', text).strip().decode('ascii')
+
+def strip_numbering(text):
+    # "3. ¿...?", "12) ...", "4 - ..." -> sin el número inicial
+    return _numbering.sub('', text)
+
+def question_text(q):
+    # enunciado sin numeración inicial + opciones en orden de letra
+    options = q.get('options') or {}
+    parts = [strip_numbering(q.get('question') or '')] + [str(options[k]) for k in sorted(options)]
+    return normalize(' '.join(parts))
+
+def _permutations(np, seed=1):
+    # hash multiply-shift: (a*h + b) mod 2**64 >> 32, con a impar; sin divisiones
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 64, size=NUM_PERM, dtype=np.uint64, endpoint=False) | np.uint64(1)
+    b = rng.integers(0, 1 << 64, size=NUM_PERM, dtype=np.uint64, endpoint=False)
+    return a, b
+
+def signatures(texts):
+    # Firma MinHash (NUM_PERM valores por texto), vectorizada por bloques de textos
+    import numpy as np
+    a, b = _permutations(np)
+    sigs = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    for start in range(0, len(texts), CHUNK):
+        data = [t.encode('utf-8').ljust(SHINGLE) for t in texts[start:start + CHUNK]]
+        lengths = np.fromiter((len(d) - SHINGLE + 1 for d in data), dtype=np.int64, count=len(data))
+        offsets = np.concatenate(([0], np.cumsum([len(d) for d in data])[:-1]))
+        buf = np.frombuffer(b''.join(data), dtype=np.uint8).astype(np.uint64)
+        # posición de inicio de cada shingle, sin cruzar de un texto al siguiente
+        seg = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        pos = np.arange(lengths.sum()) - np.repeat(seg - offsets, lengths)
+        code = np.zeros(len(pos), dtype=np.uint64)
+        for j in range(SHINGLE):
+            code |= buf[pos + j] << np.uint64(8 * j)
+        # mezcla a 64 bits (multiplicación de Fibonacci)
+        h = code * np.uint64(0x9E3779B97F4A7C15)
+        shift = np.uint64(32)
+        for p in range(NUM_PERM):
+            sigs[start:start + len(data), p] = np.minimum.reduceat((a[p] * h + b[p]) >> shift, seg)
+    return sigs
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+class DedupIndex:
+    def __init__(self, threshold=THRESHOLD):
+        self.threshold = threshold
+        # (sección, fichero, posición, qid) de cada pregunta indexada
+        self.items = []
+        self.questions = []
+        self.clusters = []
+        self._cluster_of = {}
+        # firmas por fichero: solo se recalculan los ficheros que cambian
+        self._sigs = {}
+
+    def build(self, bank, progress=None):
+        import numpy as np
+        files = [bf for sec in bank.sections() for bf in bank.files(sec)]
+        # las firmas nuevas se calculan todas juntas (numpy rinde con lotes grandes)
+        stale = [bf for bf in files if self._sigs.get(bf.path, (None,))[0] is not bf]
+        texts = []
+        for done, bf in enumerate(stale):
+            if progress and done % 100 == 0:
+                progress(done, len(stale))
+            texts.extend(question_text(q) for q in bf.questions)
+        fresh = signatures(texts)
+        cache, start = {}, 0
+        for bf in files:
+            hit = self._sigs.get(bf.path)
+            if hit is not None and hit[0] is bf:
+                cache[bf.path] = hit
+            else:
+                cache[bf.path] = (bf, fresh[start:start + len(bf.questions)])
+                start += len(bf.questions)
+        parts = [cache[bf.path][1] for bf in files]
+        self._sigs = cache
+        self.items = [(bf.section, bf.path, i, qid) for bf in files for i, qid in enumerate(bf.qids)]
+        self.questions = [q for bf in files for q in bf.questions]
+        self._cluster(np.concatenate(parts) if parts else np.empty((0, NUM_PERM), dtype=np.uint32))
+        if progress:
+            progress(len(stale), len(stale))
+        return self
+
+    def _cluster(self, sigs):
+        import numpy as np
+        n = len(sigs)
+        uf = _UnionFind(n)
+        mult = np.random.default_rng(2).integers(0, 1 << 64, size=ROWS, dtype=np.uint64, endpoint=False) | np.uint64(1)
+        for band in range(BANDS):
+            # clave de cubo de la banda; dentro de un cubo se compara con su primer elemento
+            keys = (sigs[:, band * ROWS:(band + 1) * ROWS].astype(np.uint64) * mult).sum(axis=1)
+            order = np.argsort(keys, kind='stable')
+            sk = keys[order]
+            new = np.concatenate(([True], sk[1:] != sk[:-1]))
+            # primer elemento del cubo de cada posición; se compara solo con él
+            first = order[np.flatnonzero(new)[np.cumsum(new) - 1]]
+            pairs = ~new
+            a, b = first[pairs], order[pairs]
+            similar = (sigs[a] == sigs[b]).mean(axis=1) >= self.threshold
+            for i, j in zip(a[similar].tolist(), b[similar].tolist()):
+                uf.union(i, j)
+        groups = {}
+        for i in range(n):
+            groups.setdefault(uf.find(i), []).append(i)
+        self.clusters = sorted((g for g in groups.values() if len(g) > 1), key=len, reverse=True)
+        self._cluster_of = {self.items[i][3]: c for c, g in enumerate(self.clusters) for i in g}
+
+    def cluster_of(self, qid):
+        # nº de grupo de la pregunta, o None si no tiene duplicados
+        return self._cluster_of.get(qid)
+
+    def cluster_ids(self, qids):
+        # Igual que cluster_of para un array de ids; -1 = sin duplicados
+        import numpy as np
+        return np.fromiter((self._cluster_of.get(int(q), -1) for q in qids), dtype=np.int64, count=len(qids))
+
+    def report(self):
+        return [{'size': len(g), 'questions': [
+                    {'section': self.items[i][0], 'file': self.items[i][1], 'position': self.items[i][2],
+                     'qid': self.items[i][3], 'question': self.questions[i].get('question')} for i in g]}
+                for g in self.clusters]
+
+# banco -> {umbral: (versión, índice)}; se libera con el banco, como en sampling.get_index
+_cache = weakref.WeakKeyDictionary()
+# Los generadores de exámenes llaman desde varios hilos a la vez: uno construye
+# el índice y los demás esperan y lo reutilizan
+_lock = threading.Lock()
+
+def get_dedup(bank, threshold=THRESHOLD, progress=None):
+    # Se reconstruye cuando cambia el banco, reutilizando las firmas de los ficheros
+    # intactos; el índice anterior no se modifica (puede estar en uso en otro hilo)
+    with _lock:
+        cache = _cache.setdefault(bank, {})
+        hit = cache.get(threshold)
+        if hit is not None and hit[0] == bank.version:
+            return hit[1]
+        version = bank.version
+        index = DedupIndex(threshold)
+        if hit is not None:
+            index._sigs = hit[1]._sigs
+        index.build(bank, progress)
+        cache[threshold] = (version, index)
+        return index
+
+def main(argv=None):
+    from question_bank import QuestionBank
+    ap = argparse.ArgumentParser(description='Informe de preguntas casi duplicadas en tests_json')
+    ap.add_argument('--base', default='./tests_json', help='carpeta del banco de preguntas')
+    ap.add_argument('--threshold', type=float, default=THRESHOLD, help='similitud mínima estimada (0-1)')
+    ap.add_argument('--out', default=None, help='guardar el informe completo en JSON')
+    ap.add_argument('--show', type=int, default=20, help='grupos que se muestran por pantalla')
+    args = ap.parse_args(argv)
+    bank = QuestionBank(args.base)
+    bank.refresh()
+    index = DedupIndex(args.threshold).build(bank)
+    report = index.report()
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    dups = sum(c['size'] for c in report)
+    print(f'{len(index.items)} preguntas, {len(report)} grupos de casi duplicados ({dups} preguntas)')
+    for c in report[:args.show]:
+        print(f"\n[{c['size']}]")
+        for q in c['questions']:
+            print(f"  {q['section']}/{q['file'].rsplit('/', 1)[-1]}#{q['position'] + 1}: {q['question']}")
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+import re
+import zipfile
+from xml.etree import ElementTree as ET
+
+# Parser de .docx en streaming: lee word/document.xml directamente del zip,
+# sin construir el Document de python-docx, con memoria constante.
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+BODY, P, R, HYPERLINK = W + 'body', W + 'p', W + 'r', W + 'hyperlink'
+RUN_TEXT = {W + 't': None, W + 'tab': '\t', W + 'ptab': '\t', W + 'noBreakHyphen': '-', W + 'cr': '\n'}
+
+_LETTER = re.compile(r'([ABCD])')
+_OPTION_PREFIX = re.compile(r'^[ABCD][\.\)\-]')
+
+# Gramática pregunta/opción/"Respuesta" en una sola expresión por variante:
+# 'app' reproduce parse_test de Test_Generator.py y 'convert' el de convertir_a_json.py
+GRAMMARS = {
+    'app': re.compile(r'(?P<q>(?![ABCD][\.)]).+\?$)'
+                      r'|(?P<o>[ABCD][\.\)\-]\s+)'
+                      r'|(?P<a>(?i:respuesta[:]?[ \t]*[ABCD]))'),
+    'convert': re.compile(r'(?P<q>(?![ABCD][\.\)\-]).+\?$)'
+                          r'|(?P<o>[ABCD][\.\)\-]\s+)'
+                          r'|(?P<a>(?i:respuesta[:]? \s*[ABCD]))'),
+}
+# Solo la variante de la app rellena respuestas con la primera letra de las opciones
+FALLBACK = {'app': True, 'convert': False}
+
+def _run_text(r):
+    parts = []
+    for child in r:
+        if child.tag in RUN_TEXT:
+            parts.append(RUN_TEXT[child.tag] or child.text or '')
+        elif child.tag == W + 'br' and child.get(W + 'type', 'textWrapping') == 'textWrapping':
+            parts.append('\n')
+    return ''.join(parts)
+
+def _paragraph_text(p):
+    parts = []
+    for child in p:
+        if child.tag == R:
+            parts.append(_run_text(child))
+        elif child.tag == HYPERLINK:
+            parts.extend(_run_text(r) for r in child if r.tag == R)
+    return ''.join(parts)
+
+def iter_paragraphs(path):
+    # Equivale a [p.text for p in Document(path).paragraphs]: solo los párrafos
+    # hijos directos de <w:body>; cada uno se descarta tras procesarlo.
+    with zipfile.ZipFile(path) as zf, zf.open('word/document.xml') as xml:
+        depth, body = 0, None
+        for event, elem in ET.iterparse(xml, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if depth == 2 and elem.tag == BODY:
+                    body = elem
+                continue
+            depth -= 1
+            if depth == 2 and body is not None:
+                if elem.tag == P:
+                    yield _paragraph_text(elem)
+                body.remove(elem)
+
+def parse_docx(path, dialect='app'):
+    grammar, fallback = GRAMMARS[dialect], FALLBACK[dialect]
+    qlist, current, letters = [], None, []
+    for text in iter_paragraphs(path):
+        t = text.strip()
+        if not t:
+            continue
+        if fallback and _OPTION_PREFIX.match(t):
+            letters.append(t[0])
+        m = grammar.match(t)
+        if m is None:
+            continue
+        if m.lastgroup == 'q':
+            if current: qlist.append(current)
+            current = {'question': t, 'options': {}, 'answer': None}
+        elif current is None:
+            continue
+        elif m.lastgroup == 'o':
+            current['options'][t[0]] = t[m.end():]
+        else:
+            a = _LETTER.search(t.upper())
+            if a: current['answer'] = a.group(1)
+    if current: qlist.append(current)
+    if fallback and any(q.get('answer') is None for q in qlist) and len(letters) >= len(qlist):
+        for q, a in zip(qlist, letters): q['answer'] = a
+    return qlist
@@ -0,0 +1,422 @@
+import os
+import sys
+import json
+import time
+import uuid
+import inspect
+import random
+import asyncio
+import argparse
+import tempfile
+from http import HTTPStatus
+from datetime import datetime
+from collections import OrderedDict
+from question_bank import QuestionBank
+from sampling import get_index
+from results_store import ResultsStore
+from attempt_log import AttemptLog
+from generar_examenes import MODES
+
+# Modo servidor para clase: HTTP/JSON sin interfaz (asyncio, sin dependencias).
+# Los alumnos piden un examen (misma sección, tipo y semilla = mismas preguntas,
+# sorteadas una vez y guardadas en memoria) y entregan sus respuestas; las
+# entregas se agrupan y se escriben por lotes en results.jsonl y attempts/.
+TESTS_BASE = './tests_json'
+RESULTS_FILE = 'results.jsonl'
+ATTEMPTS_DIR = 'attempts'
+MAX_BODY = 1 << 20
+# Entregas por escritura y espera máxima para completar un lote (s)
+BATCH = 500
+FLUSH_DELAY = 0.05
+# Exámenes sin entregar que se conservan (s) y exámenes sorteados en caché
+SESSION_TTL = 6 * 3600
+CACHE_SIZE = 256
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class ExamServer:
+    def __init__(self, bank, store, attempts, batch=BATCH, delay=FLUSH_DELAY, ttl=SESSION_TTL):
+        self.bank = bank
+        self.store = store
+        self.attempts = attempts
+        self.batch = batch
+        self.delay = delay
+        self.ttl = ttl
+        # id -> examen en curso (preguntas con respuestas, alumno, inicio)
+        self.sessions = OrderedDict()
+        self._exams = OrderedDict()
+        self._queue = None
+        self._writer = None
+        self.written = 0
+
+    # --- exámenes ---
+
+    def _draw(self, section, mode, seed, test):
+        # (versión del banco, preguntas). Se ejecuta en otro hilo: con --reload el banco
+        # queda bloqueado mientras se relee y el bucle no debe esperarlo
+        version = self.bank.version
+        if section not in self.bank.sections():
+            raise HttpError(404, f'Sección desconocida: {section}')
+        if mode == 'lesson':
+            bf = next((bf for bf in self.bank.files(section) if os.path.basename(bf.path) == test), None)
+            if bf is None:
+                raise HttpError(404, f'Test desconocido: {test}')
+            return version, [dict(q, section=section, file=bf.path, qid=qid) for q, qid in zip(bf.questions, bf.qids)]
+        # igual que select_half_questions/select_random_questions con la misma semilla
+        half, n = MODES[mode]
+        return version, get_index(self.bank, section, half).draw(n, seed)
+
+    async def _questions(self, section, mode, seed, test):
+        key = (self.bank.version, section, mode, seed, test)
+        qs = self._exams.get(key)
+        if qs is not None:
+            self._exams.move_to_end(key)
+            return qs
+        version, qs = await asyncio.get_running_loop().run_in_executor(None, self._draw, section, mode, seed, test)
+        self._exams[(version,) + key[1:]] = qs
+        if len(self._exams) > CACHE_SIZE:
+            self._exams.popitem(last=False)
+        return qs
+
+    async def start_exam(self, body):
+        section = body.get('section')
+        mode = body.get('mode', 'random20')
+        if not isinstance(section, str):
+            raise HttpError(400, 'Falta la sección')
+        if not isinstance(mode, str) or (mode != 'lesson' and mode not in MODES):
+            raise HttpError(400, f'Tipo de examen desconocido: {mode}')
+        seed = body.get('seed')
+        if seed is None:
+            seed = random.randrange(2**32)
+        if not isinstance(seed, int):
+            raise HttpError(400, 'La semilla debe ser un entero')
+        test = body.get('test') if mode == 'lesson' else None
+        if mode == 'lesson' and not isinstance(test, str):
+            raise HttpError(400, 'Falta el test')
+        qs = await self._questions(section, mode, None if mode == 'lesson' else seed, test)
+        if not qs:
+            raise HttpError(404, 'No hay preguntas disponibles para ese examen')
+        now = time.time()
+        while self.sessions and next(iter(self.sessions.values()))['started'] < now - self.ttl:
+            self.sessions.popitem(last=False)
+        exam_id = uuid.uuid4().hex
+        self.sessions[exam_id] = {'questions': qs, 'section': section, 'mode': mode, 'test': test,
+                                  'seed': None if mode == 'lesson' else seed,
+                                  'student': body.get('student'), 'started': now}
+        return {'exam': exam_id, 'section': section, 'mode': mode, 'seed': self.sessions[exam_id]['seed'],
+                'questions': [{'question': q['question'], 'options': q.get('options', {})} for q in qs]}
+
+    async def submit(self, exam_id, body):
+        answers = body.get('answers')
+        if not isinstance(answers, list):
+            raise HttpError(400, 'Falta la lista de respuestas')
+        session = self.sessions.pop(exam_id, None)
+        if session is None:
+            raise HttpError(404, 'Examen no encontrado o ya entregado')
+        graded = []
+        for i, q in enumerate(session['questions']):
+            # solo letras: cualquier otra cosa cuenta como sin responder
+            sel = answers[i] if i < len(answers) and isinstance(answers[i], str) else None
+            corr = q.get('answer')
+            graded.append({'qid': q.get('qid'), 'section': q.get('section'), 'file': q.get('file'),
+                           'question': q['question'],
+                           'selected_letter': sel, 'selected_text': q.get('options', {}).get(sel) if sel else None,
+                           'correct_letter': corr, 'correct_text': q.get('options', {}).get(corr)})
+        score = sum(1 for a in graded if a['selected_letter'] == a['correct_letter'])
+        exam = {'type': session['mode'], 'section': session['section'], 'test': session['test'],
+                'score': score, 'total': len(graded), 'date': datetime.now().isoformat(timespec='seconds')}
+        if session['seed'] is not None:
+            exam['seed'] = session['seed']
+        if session['student']:
+            exam['student'] = session['student']
+        # se responde cuando el lote que incluye esta entrega ya está en disco
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put((exam, graded, done))
+        try:
+            await done
+        except Exception:
+            # no se ha guardado: el alumno puede volver a entregar
+            self.sessions[exam_id] = session
+            raise HttpError(500, 'No se pudo guardar el resultado, vuelve a intentarlo')
+        return {'score': score, 'total': len(graded), 'correct': [a['correct_letter'] for a in graded]}
+
+    # --- escritura por lotes ---
+
+    def _write(self, exams, answers):
+        self.store.append_many(exams)
+        if self.attempts is not None:
+            self.attempts.record(answers)
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.delay
+            while len(items) < self.batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            exams = [exam for exam, _, _ in items]
+            answers = [a for _, graded, _ in items for a in graded]
+            try:
+                # ficheros y fsync en otro hilo: el bucle sigue atendiendo peticiones
+                await loop.run_in_executor(None, self._write, exams, answers)
+            except Exception as exc:
+                print(f'Error al guardar {len(items)} resultados: {exc}', file=sys.stderr)
+                for _, _, done in items:
+                    if not done.done():
+                        done.set_exception(exc)
+            else:
+                self.written += len(items)
+                for _, _, done in items:
+                    if not done.done():
+                        done.set_result(None)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    # --- HTTP ---
+
+    def sections(self):
+        return {'sections': [{'name': sec, 'tests': [os.path.basename(bf.path) for bf in self.bank.files(sec)],
+                              'questions': sum(len(bf.questions) for bf in self.bank.files(sec))}
+                             for sec in self.bank.sections()],
+                'modes': sorted(MODES) + ['lesson']}
+
+    async def dispatch(self, method, path, body):
+        parts = [p for p in path.split('/') if p]
+        if parts == ['health']:
+            allowed, handler = 'GET', lambda: {'ok': True, 'bank_version': self.bank.version,
+                                               'sessions': len(self.sessions), 'written': self.written,
+                                               'pending': self._queue.qsize()}
+        elif parts == ['sections']:
+            allowed, handler = 'GET', lambda: asyncio.get_running_loop().run_in_executor(None, self.sections)
+        elif parts == ['exams']:
+            allowed, handler = 'POST', lambda: self.start_exam(_json(body))
+        elif len(parts) == 3 and parts[0] == 'exams' and parts[2] == 'answers':
+            if method != 'POST':
+                raise HttpError(405, 'Método no permitido')
+            return await self.submit(parts[1], _json(body))
+        else:
+            raise HttpError(404, 'Ruta no encontrada')
+        if method != allowed:
+            raise HttpError(405, 'Método no permitido')
+        result = handler()
+        return await result if inspect.isawaitable(result) else result
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HttpError as exc:
+                    writer.write(_response(exc.status, {'error': str(exc)}, False))
+                    break
+                if request is None:
+                    break
+                method, target, keep_alive, body = request
+                try:
+                    status, payload = 200, await self.dispatch(method, target.split('?', 1)[0], body)
+                except HttpError as exc:
+                    status, payload = exc.status, {'error': str(exc)}
+                except Exception as exc:
+                    status, payload = 500, {'error': str(exc)}
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765):
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.ensure_future(self._write_loop())
+        return await asyncio.start_server(self.handle, host, port, backlog=1024)
+
+    async def close(self):
+        # espera a que se escriban las entregas pendientes, también el lote en curso
+        await self._queue.join()
+        self._writer.cancel()
+
+def _json(body):
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        raise HttpError(400, 'JSON no válido')
+    if not isinstance(data, dict):
+        raise HttpError(400, 'Se esperaba un objeto JSON')
+    return data
+
+async def _read_request(reader):
+    # (método, ruta, mantener conexión, cuerpo) o None si el cliente ha cerrado
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as exc:
+        if exc.partial.strip():
+            raise HttpError(400, 'Petición incompleta')
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(431, 'Cabeceras demasiado grandes')
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ', 2)
+    except ValueError:
+        raise HttpError(400, 'Petición no válida')
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HttpError(400, 'Content-Length no válido')
+    if length > MAX_BODY:
+        raise HttpError(413, 'Petición demasiado grande')
+    body = await reader.readexactly(length) if length else b''
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+    return method, target, keep_alive, body
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (f'HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n'
+            'Content-Type: application/json; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+# --- cliente de prueba: N alumnos a la vez contra un servidor ---
+
+async def _request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    length = next(int(l.split(':', 1)[1]) for l in lines if l.lower().startswith('content-length:'))
+    data = json.loads(await reader.readexactly(length))
+    if status != 200:
+        raise HttpError(status, data.get('error', ''))
+    return data
+
+async def simulate(host, port, students, section, mode='random20', seed=None, think=0.0):
+    # Cada alumno: pide el examen, "piensa" y entrega respuestas al azar.
+    # Devuelve latencias p50/p95 de cada petición y entregas por segundo.
+    seed = random.randrange(2**32) if seed is None else seed
+    starts, submits = [], []
+
+    async def student(i):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            t0 = time.perf_counter()
+            exam = await _request(reader, writer, 'POST', '/exams',
+                                  {'section': section, 'mode': mode, 'seed': seed, 'student': f'alumno{i}'})
+            starts.append(time.perf_counter() - t0)
+            rng = random.Random(i)
+            answers = [rng.choice(sorted(q['options']) or [None]) for q in exam['questions']]
+            if think:
+                await asyncio.sleep(rng.random() * think)
+            t0 = time.perf_counter()
+            await _request(reader, writer, 'POST', f"/exams/{exam['exam']}/answers", {'answers': answers})
+            submits.append(time.perf_counter() - t0)
+        finally:
+            writer.close()
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(student(i) for i in range(students)), return_exceptions=True)
+    elapsed = time.perf_counter() - t0
+    errors = [str(r) for r in results if isinstance(r, BaseException)]
+
+    def pct(xs, p):
+        return round(sorted(xs)[min(len(xs) - 1, int(p * len(xs)))] * 1000, 2) if xs else None
+    return {'students': students, 'completed': len(submits), 'errors': len(errors), 'first_error': errors[:1],
+            'elapsed_s': round(elapsed, 3), 'submits_per_s': round(len(submits) / elapsed, 1),
+            'exam_p50_ms': pct(starts, 0.5), 'exam_p95_ms': pct(starts, 0.95),
+            'submit_p50_ms': pct(submits, 0.5), 'submit_p95_ms': pct(submits, 0.95)}
+
+async def simulate_local(bank, students, section, mode='random20', seed=None, think=0.0, workdir=None):
+    # Servidor en este mismo proceso (puerto libre) con resultados en un directorio temporal
+    workdir = workdir or tempfile.mkdtemp(prefix='exam_server_')
+    os.makedirs(workdir, exist_ok=True)
+    server = ExamServer(bank, ResultsStore(os.path.join(workdir, RESULTS_FILE)),
+                        AttemptLog(os.path.join(workdir, ATTEMPTS_DIR)))
+    srv = await server.start('127.0.0.1', 0)
+    port = srv.sockets[0].getsockname()[1]
+    try:
+        report = await simulate('127.0.0.1', port, students, section, mode, seed, think)
+    finally:
+        await server.close()
+        srv.close()
+        await srv.wait_closed()
+    report['written'] = server.written
+    report['workdir'] = workdir
+    return report
+
+async def serve(args):
+    bank = QuestionBank(args.base)
+    bank.refresh()
+    server = ExamServer(bank, ResultsStore(args.results, legacy='results.json'),
+                        AttemptLog(args.attempts) if args.attempts else None)
+    srv = await server.start(args.host, args.port)
+    print(f"Servidor de exámenes en http://{args.host}:{args.port} "
+          f"({sum(len(bf.questions) for s in bank.sections() for bf in bank.files(s))} preguntas)")
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            await asyncio.sleep(args.reload or 3600)
+            if args.reload:
+                # cambios en tests_json: solo se releen los ficheros modificados
+                await loop.run_in_executor(None, bank.refresh)
+    finally:
+        await server.close()
+        srv.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Servidor HTTP/JSON de exámenes para varios alumnos a la vez')
+    ap.add_argument('--host', default='127.0.0.1', help='dirección de escucha (0.0.0.0 para toda la red)')
+    ap.add_argument('--port', type=int, default=8765, help='puerto')
+    ap.add_argument('--base', default=TESTS_BASE, help='carpeta del banco de preguntas')
+    ap.add_argument('--results', default=RESULTS_FILE, help='historial de resultados')
+    ap.add_argument('--attempts', default=ATTEMPTS_DIR, help='registro de respuestas ("" para no guardarlo)')
+    ap.add_argument('--reload', type=float, default=0, help='revisar tests_json cada N segundos (0 = no)')
+    ap.add_argument('--simulate', type=int, default=0, metavar='N',
+                    help='prueba de carga: N alumnos a la vez (servidor propio con resultados temporales)')
+    ap.add_argument('--connect', default=None, metavar='HOST:PORT', help='con --simulate, usar un servidor ya en marcha')
+    ap.add_argument('--section', default=None, help='con --simulate, sección del examen')
+    ap.add_argument('--mode', default='random20', choices=sorted(MODES), help='con --simulate, tipo de examen')
+    ap.add_argument('--seed', type=int, default=None, help='con --simulate, semilla del examen')
+    ap.add_argument('--think', type=float, default=0.0, help='con --simulate, segundos máximos entre pedir y entregar')
+    args = ap.parse_args(argv)
+    if not args.simulate:
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if args.connect:
+        if not args.section:
+            ap.error('--connect necesita --section')
+        host, port = args.connect.rsplit(':', 1)
+        report = asyncio.run(simulate(host, int(port), args.simulate, args.section, args.mode, args.seed, args.think))
+    else:
+        bank = QuestionBank(args.base)
+        bank.refresh()
+        section = args.section or bank.sections()[0]
+        report = asyncio.run(simulate_local(bank, args.simulate, section, args.mode, args.seed, args.think))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0 if not report['errors'] else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
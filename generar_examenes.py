@@ -0,0 +1,154 @@
+import io
+import os
+import json
+import time
+import random
+import zipfile
+import argparse
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor
+from question_bank import QuestionBank
+from sampling import get_index
+from dedup import strip_numbering
+
+# Generación sin interfaz de N variantes de examen de una sección, con
+# opciones barajadas y clave de respuestas, en .docx y .json.
+TESTS_BASE = './tests_json'
+OUTPUT_DIR = './examenes'
+# Tipos de examen: (mitad de temas, nº de preguntas), igual que en la app
+MODES = {'random20': (None, 20), 'half_first': ('first', 40), 'half_second': ('second', 40)}
+
+def shuffle_options(q, rng):
+    labels = sorted(q['options'])
+    order = labels[:]
+    rng.shuffle(order)
+    options = {new: q['options'][old] for new, old in zip(labels, order)}
+    answer = next((new for new, old in zip(labels, order) if old == q.get('answer')), None)
+    return {'question': q['question'], 'options': options, 'answer': answer}
+
+def generate_variants(section, count, mode='random20', n_questions=None, seed=0, shuffle=True, bank=None, max_tries=20):
+    half, default_n = MODES[mode]
+    if bank is None:
+        bank = QuestionBank(TESTS_BASE)
+        bank.refresh(section)
+    index = get_index(bank, section, half)
+    k = n_questions or default_n
+    master = random.Random(seed)
+    seen, variants = set(), []
+    for number in range(1, count + 1):
+        # se descartan variantes con el mismo conjunto de preguntas que otra anterior
+        for _ in range(max_tries):
+            vseed = master.getrandbits(32)
+            positions = index.sample(k, vseed)
+            key = frozenset(positions)
+            if key not in seen:
+                break
+        seen.add(key)
+        rng = random.Random(vseed)
+        questions = [index.materialize(p) for p in positions]
+        if shuffle:
+            questions = [dict(shuffle_options(q, rng), qid=q['qid'], file=q['file']) for q in questions]
+        variants.append({'number': number, 'seed': vseed, 'section': section, 'mode': mode,
+                         'questions': questions})
+    return variants
+
+_template = None
+
+def _docx_template():
+    # python-docx solo se usa una vez por proceso para obtener el paquete por
+    # defecto (estilos, tema...), que se guarda ya comprimido sin document.xml;
+    # cada examen es una copia de esos bytes a la que se añade su document.xml
+    global _template
+    if _template is None:
+        from docx import Document
+        buf = io.BytesIO()
+        Document().save(buf)
+        out = io.BytesIO()
+        with zipfile.ZipFile(buf) as src, zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as dst:
+            for info in src.infolist():
+                if info.filename == 'word/document.xml':
+                    xml = src.read(info).decode('utf-8')
+                else:
+                    dst.writestr(info, src.read(info), zipfile.ZIP_DEFLATED)
+        start = xml.index('<w:body>') + len('<w:body>')
+        _template = (out.getvalue(), xml[:start], xml[xml.index('<w:sectPr', start):])
+    return _template
+
+def _paragraph(text, style=None):
+    ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    return f'<w:p>{ppr}<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+def write_docx(path, title, paragraphs):
+    package, head, tail = _docx_template()
+    body = _paragraph(title, 'Heading1') + ''.join(_paragraph(text) for text in paragraphs)
+    with open(path, 'wb') as f:
+        f.write(package)
+    with zipfile.ZipFile(path, 'a', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('word/document.xml', (head + body + tail).encode('utf-8'))
+
+def render_variant(variant, out_dir, formats):
+    name = f"examen_{variant['number']:03d}"
+    qs = variant['questions']
+    title = f"{variant['section']} – variante {variant['number']}"
+    if 'json' in formats:
+        # mismo formato que tests_json: se puede volver a cargar con "Añadir Test"
+        with open(os.path.join(out_dir, name + '.json'), 'w', encoding='utf-8') as f:
+            json.dump([{k: q[k] for k in ('question', 'options', 'answer')} for q in qs], f, indent=2, ensure_ascii=False)
+    if 'docx' in formats:
+        body = []
+        for i, q in enumerate(qs, 1):
+            # las preguntas del banco traen su propia numeración ("5. ¿...?")
+            body.append(f"{i}. {strip_numbering(q['question'])}")
+            body.extend(f"{label}) {text}" for label, text in sorted(q['options'].items()))
+        write_docx(os.path.join(out_dir, name + '.docx'), title, body)
+        write_docx(os.path.join(out_dir, name + '_clave.docx'), f'Clave – {title}',
+                    [f"{i}. {q.get('answer') or '–'}" for i, q in enumerate(qs, 1)])
+    return name
+
+def _render_chunk(chunk, out_dir, formats):
+    return [render_variant(v, out_dir, formats) for v in chunk]
+
+def write_variants(variants, out_dir=OUTPUT_DIR, formats=('docx', 'json'), jobs=None):
+    os.makedirs(out_dir, exist_ok=True)
+    keys = {f"examen_{v['number']:03d}": {'seed': v['seed'], 'answers': [q.get('answer') for q in v['questions']],
+                                          'qids': [q['qid'] for q in v['questions']]}
+            for v in variants}
+    with open(os.path.join(out_dir, 'claves.json'), 'w', encoding='utf-8') as f:
+        json.dump(keys, f, indent=2, ensure_ascii=False)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(variants) <= 1:
+        return _render_chunk(variants, out_dir, formats)
+    # lotes para repartir el coste de enviar cada variante al proceso hijo
+    size = max(1, len(variants) // (jobs * 4))
+    chunks = [variants[i:i + size] for i in range(0, len(variants), size)]
+    names = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for done in pool.map(_render_chunk, chunks, [out_dir] * len(chunks), [formats] * len(chunks)):
+            names.extend(done)
+    return names
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Genera variantes de examen de una sección sin abrir la aplicación')
+    ap.add_argument('section', help='sección de tests_json (o General)')
+    ap.add_argument('--variants', '-n', type=int, default=1, help='número de variantes distintas')
+    ap.add_argument('--mode', choices=sorted(MODES), default='random20', help='tipo de examen')
+    ap.add_argument('--questions', type=int, default=None, help='preguntas por examen (por defecto, las del tipo)')
+    ap.add_argument('--seed', type=int, default=0, help='semilla: misma semilla, mismas variantes')
+    ap.add_argument('--out', default=OUTPUT_DIR, help='carpeta de salida')
+    ap.add_argument('--formats', default='docx,json', help='formatos separados por comas: docx, json')
+    ap.add_argument('--no-shuffle', action='store_true', help='no barajar las opciones')
+    ap.add_argument('--jobs', '-j', type=int, default=None, help='procesos en paralelo (por defecto, todos los núcleos)')
+    args = ap.parse_args(argv)
+    start = time.perf_counter()
+    variants = generate_variants(args.section, args.variants, args.mode, args.questions, args.seed,
+                                 shuffle=not args.no_shuffle)
+    if not variants or not variants[0]['questions']:
+        print(f'No hay preguntas en la sección {args.section}.')
+        return 1
+    formats = tuple(f.strip() for f in args.formats.split(',') if f.strip())
+    write_variants(variants, args.out, formats, args.jobs)
+    print(f'{len(variants)} variantes en {args.out} ({time.perf_counter() - start:.2f}s)')
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
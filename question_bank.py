@@ -0,0 +1,289 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from glob import glob
+from collections import namedtuple
+
+# Índice persistente del banco de preguntas (SQLite)
+SCHEMA_VERSION = 2
+DB_NAME = '.question_bank.sqlite'
+# Búsqueda de texto (FTS5): rowid = id del fichero << SEARCH_BITS | posición de la pregunta
+SEARCH_BITS = 20
+SEARCH_MASK = (1 << SEARCH_BITS) - 1
+_word = re.compile(r'\w+')
+
+BankFile = namedtuple('BankFile', 'path section subject topic questions qids')
+
+def question_id(section, path, q):
+    # Id estable de una pregunta: sección, fichero y enunciado (63 bits, cabe en int64)
+    key = f"{section}/{os.path.basename(path)}\n{q.get('question', '')}"
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') >> 1
+
+def is_question_list(data):
+    # Un test es una lista de preguntas {"question": ..., "options": {...}}
+    return isinstance(data, list) and all(
+        isinstance(q, dict) and 'question' in q and isinstance(q.get('options'), dict) for q in data)
+
+def make_bank_file(path, section, subject, topic, questions):
+    return BankFile(path, section, subject, topic, questions,
+                    [question_id(section, path, q) for q in questions])
+
+def get_subject_and_topic(path):
+    base = os.path.basename(path)
+    match = re.match(r'(.+?)_+Tema(\d+)', base, re.IGNORECASE)
+    if match:
+        subject = match.group(1).replace('_', ' ')
+        topic = int(match.group(2))
+        return subject.strip(), topic
+    return None, None
+
+def section_pattern(base, section):
+    return os.path.join(base, '*.json') if section == 'General' else os.path.join(base, section, '*.json')
+
+def search_query(text):
+    # Texto libre -> consulta FTS5: todas las palabras, la última como prefijo (búsqueda al teclear)
+    words = _word.findall(text or '')
+    if not words:
+        return None
+    return ' '.join(f'"{w}"' for w in words[:-1]) + f' "{words[-1]}"*'
+
+def list_sections(base):
+    secs = [d for d in os.listdir(base)
+            if os.path.isdir(os.path.join(base, d))]
+    if not secs and glob(os.path.join(base, '*.json')):
+        secs = ['General']
+    return secs
+
+class QuestionBank:
+    def __init__(self, base, db_path=None):
+        self.base = base
+        self.db_path = db_path or os.path.join(base, DB_NAME)
+        self.errors = {}
+        # Se incrementa cada vez que cambia el contenido del banco
+        self.version = 0
+        self._files = {}
+        self._by_section = {}
+        self._stamps = {}
+        self._search_ids = {}
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._init_db()
+        self._load()
+
+    def _init_db(self):
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self._db.execute('DROP TABLE IF EXISTS files')
+            self._db.execute('DROP TABLE IF EXISTS search_files')
+            self._db.execute('DROP TABLE IF EXISTS search')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            section TEXT NOT NULL,
+            subject TEXT,
+            topic INTEGER,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            questions TEXT NOT NULL)''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS files_section ON files(section)')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS search_files (
+            id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL)''')
+        # unicode61 sin diacríticos: "informacion" encuentra "información" y al revés
+        self._db.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(
+            question, options, section UNINDEXED,
+            tokenize = "unicode61 remove_diacritics 2")''')
+        self._db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self._db.commit()
+
+    def _load(self):
+        rows = self._db.execute(
+            'SELECT path, section, subject, topic, mtime_ns, size, questions FROM files').fetchall()
+        self._search_ids = dict(self._db.execute('SELECT path, id FROM search_files'))
+        bad = set()
+        for path, sec, subject, topic, mtime_ns, size, questions in rows:
+            try:
+                questions = json.loads(questions)
+            except ValueError:
+                questions = None
+            if not is_question_list(questions):
+                # fila que no se puede reconstruir: se descarta y el fichero se relee en refresh
+                bad.add(path)
+                continue
+            self._put(make_bank_file(path, sec, subject, topic, questions), (mtime_ns, size))
+        for path in bad:
+            self._delete_rows(path)
+        if bad:
+            self._db.commit()
+
+    def _put(self, bf, stamp):
+        old = self._files.get(bf.path)
+        if old is None or old.section != bf.section:
+            if old is not None:
+                self._by_section[old.section].remove(old.path)
+            self._by_section.setdefault(bf.section, []).append(bf.path)
+            self._by_section[bf.section].sort()
+        self._files[bf.path] = bf
+        self._stamps[bf.path] = stamp
+
+    def _drop(self, path):
+        bf = self._files.pop(path, None)
+        self._stamps.pop(path, None)
+        if bf is not None:
+            self._by_section[bf.section].remove(path)
+
+    def _index_file(self, path, section, stamp):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                questions = json.load(f)
+        except (OSError, ValueError) as exc:
+            self.errors[path] = str(exc)
+            return False
+        if not is_question_list(questions):
+            # JSON válido pero no es un test (otro .json en la carpeta)
+            self.errors[path] = 'No es una lista de preguntas con "question" y "options"'
+            return False
+        self.errors.pop(path, None)
+        subject, topic = get_subject_and_topic(path)
+        bf = make_bank_file(path, section, subject, topic, questions)
+        self._db.execute(
+            'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (path, section, subject, topic, stamp[0], stamp[1],
+             json.dumps(questions, ensure_ascii=False, separators=(',', ':'))))
+        self._put(bf, stamp)
+        self._index_search(path, section, questions)
+        return True
+
+    def _search_rows(self, path):
+        fid = self._search_ids.get(path)
+        return None if fid is None else (fid << SEARCH_BITS, (fid << SEARCH_BITS) | SEARCH_MASK)
+
+    def _index_search(self, path, section, questions):
+        # Se reemplazan solo las filas de este fichero (un rango de rowid)
+        rows = self._search_rows(path)
+        if rows is None:
+            fid = self._db.execute('INSERT INTO search_files (path) VALUES (?)', (path,)).lastrowid
+            self._search_ids[path] = fid
+        else:
+            fid = rows[0] >> SEARCH_BITS
+            self._db.execute('DELETE FROM search WHERE rowid BETWEEN ? AND ?', rows)
+        self._db.executemany(
+            'INSERT INTO search (rowid, question, options, section) VALUES (?, ?, ?, ?)',
+            (((fid << SEARCH_BITS) | i, str(q.get('question', '')),
+              ' '.join(str(v) for v in (q.get('options') or {}).values()), section)
+             for i, q in enumerate(questions[:SEARCH_MASK + 1])))
+
+    def _revalidate(self, path, section, changed):
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._forget(path, changed)
+            return False
+        stamp = (st.st_mtime_ns, st.st_size)
+        if not (self._stamps.get(path) == stamp and self._files[path].section == section):
+            if self._index_file(path, section, stamp):
+                changed.add(path)
+        return True
+
+    def _delete_rows(self, path):
+        self._db.execute('DELETE FROM files WHERE path = ?', (path,))
+        rows = self._search_rows(path)
+        if rows is not None:
+            self._db.execute('DELETE FROM search WHERE rowid BETWEEN ? AND ?', rows)
+            self._db.execute('DELETE FROM search_files WHERE path = ?', (path,))
+            del self._search_ids[path]
+
+    def _forget(self, path, changed):
+        if path in self._files:
+            self._delete_rows(path)
+            self._drop(path)
+            changed.add(path)
+
+    def _finish(self, changed):
+        if changed:
+            self._db.commit()
+            self.version += 1
+
+    def refresh(self, section=None, progress=None):
+        # Revalida contra disco: solo se releen los ficheros con mtime/tamaño distinto
+        with self._lock:
+            sections = [section] if section is not None else list_sections(self.base)
+            listing = [(sec, glob(section_pattern(self.base, sec))) for sec in sections]
+            total = sum(len(paths) for _, paths in listing)
+            done = 0
+            changed = set()
+            try:
+                for sec, paths in listing:
+                    seen = set()
+                    for path in paths:
+                        if progress:
+                            progress(done, total)
+                        done += 1
+                        if self._revalidate(path, sec, changed):
+                            seen.add(path)
+                    for path in list(self._by_section.get(sec, [])):
+                        if path not in seen:
+                            self._forget(path, changed)
+                if section is None:
+                    for sec in set(self._by_section) - set(sections):
+                        for path in list(self._by_section[sec]):
+                            self._forget(path, changed)
+            finally:
+                # también si se cancela a mitad: lo ya indexado queda guardado
+                self._finish(changed)
+            return changed
+
+    def update(self, section, paths):
+        # Revalida solo los ficheros indicados (altas, bajas o cambios), sin listar la carpeta
+        with self._lock:
+            changed = set()
+            try:
+                for path in paths:
+                    self._revalidate(path, section, changed)
+            finally:
+                self._finish(changed)
+            return changed
+
+    def sections(self):
+        with self._lock:
+            return sorted(sec for sec, paths in self._by_section.items() if paths)
+
+    def files(self, section):
+        with self._lock:
+            return [self._files[p] for p in self._by_section.get(section, [])]
+
+    def file(self, path):
+        with self._lock:
+            return self._files.get(path)
+
+    def questions(self, section):
+        return [q for bf in self.files(section) for q in bf.questions]
+
+    def search(self, text, section=None, limit=50):
+        # Preguntas con todas las palabras buscadas (sin tildes ni mayúsculas), las más
+        # relevantes primero (bm25; el enunciado pesa el doble que las opciones)
+        query = search_query(text)
+        if query is None:
+            return []
+        sql = 'SELECT rowid FROM search WHERE search MATCH ?'
+        params = [query]
+        if section is not None:
+            sql += ' AND section = ?'
+            params.append(section)
+        sql += ' ORDER BY bm25(search, 2.0, 1.0) LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            paths = {fid: path for path, fid in self._search_ids.items()}
+            hits = []
+            for rowid, in self._db.execute(sql, params):
+                bf = self._files.get(paths.get(rowid >> SEARCH_BITS))
+                pos = rowid & SEARCH_MASK
+                if bf is not None and pos < len(bf.questions):
+                    hits.append(dict(bf.questions[pos], section=bf.section, file=bf.path, qid=bf.qids[pos]))
+            return hits
+
+    def close(self):
+        with self._lock:
+            self._db.close()
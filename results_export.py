@@ -0,0 +1,139 @@
+import os
+import csv
+import json
+import argparse
+from array import array
+from datetime import datetime
+
+# Exportación del historial en streaming: se recorre results.jsonl por bloques,
+# se filtra al vuelo y se escribe a un temporal que solo sustituye al destino
+# al terminar (cancelar no deja ficheros a medias).
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.npz': 'npz'}
+CSV_HEADER = ['Fecha', 'Sección', 'Tipo', 'Test', 'Aciertos', 'Total', 'Porcentaje']
+CHUNK = 5000
+EPOCH = datetime(1970, 1, 1)
+
+def format_for(path):
+    return FORMATS.get(os.path.splitext(path)[1].lower(), 'csv')
+
+def _day(value):
+    # fecha, datetime o texto ISO -> 'AAAA-MM-DD' (las fechas de los exámenes se comparan como texto)
+    if value is None:
+        return None
+    return value.isoformat()[:10] if hasattr(value, 'isoformat') else str(value)[:10]
+
+def iter_filtered(store, section=None, typ=None, since=None, until=None):
+    # Genera (examen, offset); until es exclusivo, como el filtro de la tabla
+    since, until = _day(since), _day(until)
+    for exam, offset in store.read_from(0):
+        if section is not None and exam.get('section', 'General') != section:
+            continue
+        if typ is not None and exam.get('type', '') != typ:
+            continue
+        day = exam.get('date', '')[:10]
+        if (since is not None and day < since) or (until is not None and day >= until):
+            continue
+        yield exam, offset
+
+def _csv_row(e):
+    score, total = e.get('score', 0), e.get('total', 0)
+    pct = f"{(score/total*100):.2f}%" if total else "-"
+    return [e.get('date', '')[:19].replace('T', ' '), e.get('section', 'General'), e.get('type', ''),
+            e.get('test', ''), score, total, pct]
+
+class _CsvWriter:
+    def __init__(self, f):
+        self.writer = csv.writer(f)
+        self.writer.writerow(CSV_HEADER)
+
+    def write(self, exams):
+        self.writer.writerows(_csv_row(e) for e in exams)
+
+class _JsonlWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, exams):
+        self.f.write(''.join(json.dumps(e, ensure_ascii=False, separators=(',', ':')) + '\n' for e in exams))
+
+class _NpzWriter:
+    # Columnas compactas (array + categorías) que se vuelcan a .npz al cerrar
+    def __init__(self, path):
+        self.path = path
+        self.date, self.score, self.total = array('q'), array('l'), array('l')
+        self.codes = {'section': array('l'), 'type': array('l'), 'test': array('l')}
+        self.labels = {name: {} for name in self.codes}
+
+    def write(self, exams):
+        for e in exams:
+            try:
+                # segundos desde 1970 sin zona horaria: datetime64 conserva la hora local anotada
+                self.date.append(int((datetime.fromisoformat(e.get('date', '')[:19]) - EPOCH).total_seconds()))
+            except (TypeError, ValueError):
+                self.date.append(-1)
+            self.score.append(e.get('score', 0)); self.total.append(e.get('total', 0))
+            for name, default in (('section', 'General'), ('type', ''), ('test', '')):
+                labels = self.labels[name]
+                value = str(e.get(name, default))
+                self.codes[name].append(labels.setdefault(value, len(labels)))
+
+    def close(self):
+        import numpy as np
+        cols = {'date': np.frombuffer(self.date, dtype=np.int64).astype('datetime64[s]'),
+                'score': np.frombuffer(self.score, dtype=np.dtype('l')).astype(np.int32),
+                'total': np.frombuffer(self.total, dtype=np.dtype('l')).astype(np.int32)}
+        for name, codes in self.codes.items():
+            cols[name] = np.frombuffer(codes, dtype=np.dtype('l')).astype(np.int32)
+            cols[name + '_labels'] = np.array(list(self.labels[name]), dtype=str)
+        with open(self.path, 'wb') as f:
+            np.savez_compressed(f, **cols)
+
+def export(store, path, fmt=None, section=None, typ=None, since=None, until=None, chunk=CHUNK, progress=None):
+    # Devuelve el nº de exámenes exportados; progress(KB leídos, KB totales)
+    fmt = fmt or format_for(path)
+    try:
+        total_kb = os.path.getsize(store.path) // 1024
+    except OSError:
+        total_kb = 0
+    tmp = f'{path}.{os.getpid()}.tmp'
+    count = 0
+    try:
+        with open(tmp, 'w', newline='', encoding='utf-8') as f:
+            writer = _NpzWriter(tmp) if fmt == 'npz' else _JsonlWriter(f) if fmt == 'jsonl' else _CsvWriter(f)
+            block = []
+            for exam, offset in iter_filtered(store, section, typ, since, until):
+                block.append(exam)
+                if len(block) >= chunk:
+                    writer.write(block); count += len(block); block = []
+                    if progress:
+                        progress(offset // 1024, total_kb)
+            writer.write(block); count += len(block)
+        if fmt == 'npz':
+            writer.close()
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if progress:
+        progress(total_kb, total_kb)
+    return count
+
+def main(argv=None):
+    from results_store import ResultsStore
+    ap = argparse.ArgumentParser(description='Exporta el historial de exámenes a CSV, JSONL o NumPy (.npz)')
+    ap.add_argument('output', help='fichero de salida; el formato se deduce de la extensión')
+    ap.add_argument('--results', default='results.jsonl', help='historial de resultados')
+    ap.add_argument('--format', choices=sorted(set(FORMATS.values())), default=None, help='formato (por defecto, según la extensión)')
+    ap.add_argument('--section', default=None, help='solo esta sección')
+    ap.add_argument('--type', dest='typ', default=None, help='solo este tipo de examen')
+    ap.add_argument('--since', default=None, help='desde esta fecha (AAAA-MM-DD, incluida)')
+    ap.add_argument('--until', default=None, help='hasta esta fecha (AAAA-MM-DD, excluida)')
+    args = ap.parse_args(argv)
+    n = export(ResultsStore(args.results, legacy='results.json'), args.output, args.format,
+               args.section, args.typ, args.since, args.until)
+    print(f'{n} exámenes exportados a {args.output}')
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
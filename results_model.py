@@ -0,0 +1,192 @@
+from array import array
+from datetime import datetime, timedelta
+from PyQt5 import QtCore, QtGui
+
+# Historial de exámenes en columnas compactas (arrays + diccionarios de
+# categorías) y modelo Qt que las muestra bajo demanda.
+EPOCH = datetime(1970, 1, 1)
+NO_DATE = -1
+
+def _seconds(date):
+    try:
+        return int((datetime.fromisoformat(date[:19]) - EPOCH).total_seconds())
+    except (TypeError, ValueError):
+        return NO_DATE
+
+class Categories:
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+class ExamColumns:
+    def __init__(self):
+        self.date = array('q')
+        self.score = array('l')
+        self.total = array('l')
+        self.section, self.type, self.test = array('L'), array('L'), array('L')
+        self.sections, self.types, self.tests = Categories(), Categories(), Categories()
+        self.offset = 0
+        self.last_id = None
+
+    def __len__(self):
+        # total es la última columna que se rellena: una fila contada está completa
+        # aunque otro hilo esté añadiendo la siguiente
+        return len(self.total)
+
+    def append(self, e):
+        self.date.append(_seconds(e.get('date', '')))
+        self.section.append(self.sections.code(str(e.get('section', 'General'))))
+        self.type.append(self.types.code(str(e.get('type', ''))))
+        self.test.append(self.tests.code(str(e.get('test', ''))))
+        self.score.append(e['score'])
+        self.total.append(e['total'])
+
+    def sync(self, store):
+        # Añade solo lo escrito desde la última lectura; devuelve el primer índice nuevo
+        if not store.ends_with(self.offset, self.last_id):
+            self.__init__()
+        first = len(self)
+        for e, offset in store.read_from(self.offset):
+            self.append(e)
+            self.offset, self.last_id = offset, e.get('id')
+        return first
+
+    def date_text(self, i):
+        s = self.date[i]
+        return '' if s == NO_DATE else str(EPOCH + timedelta(seconds=s))
+
+    def percent(self, i):
+        return (self.score[i] / self.total[i] * 100) if self.total[i] else 0
+
+class ResultsTableModel(QtCore.QAbstractTableModel):
+    HEADERS = ['Fecha', 'Sección', 'Tipo', 'Test', 'Aciertos/Total', 'Porcentaje']
+    BATCH = 500
+
+    def __init__(self, columns, parent=None):
+        super().__init__(parent)
+        self.cols = columns
+        self._filter = (None, None, None, None)
+        self._filter_args = (None, None, None, None)
+        self._sort = (0, QtCore.Qt.AscendingOrder)
+        self._rows = array('l')
+        self._loaded = 0
+        # filas de las columnas ya repartidas en _rows: otro hilo puede estar añadiendo más
+        self._seen = 0
+        self._rebuild()
+
+    def _matches(self, i):
+        sec, typ, since, until = self._filter
+        c = self.cols
+        return ((sec is None or c.section[i] == sec) and (typ is None or c.type[i] == typ)
+                and (since is None or c.date[i] >= since) and (until is None or c.date[i] < until))
+
+    def _key(self, column):
+        c = self.cols
+        return [c.date.__getitem__,
+                lambda i: c.sections.values[c.section[i]],
+                lambda i: c.types.values[c.type[i]],
+                lambda i: c.tests.values[c.test[i]],
+                lambda i: (c.score[i], c.total[i]),
+                c.percent][column]
+
+    def _rebuild(self):
+        # Índices de fila sobre las columnas: filtrar y ordenar no copia datos
+        self.beginResetModel()
+        self._seen = len(self.cols)
+        rows = (i for i in range(self._seen) if self._matches(i))
+        column, order = self._sort
+        self._rows = array('l', sorted(rows, key=self._key(column),
+                                       reverse=order == QtCore.Qt.DescendingOrder))
+        self._loaded = min(self.BATCH, len(self._rows))
+        self.endResetModel()
+
+    def set_filter(self, section=None, typ=None, since=None, until=None):
+        self._filter_args = (section, typ, since, until)
+        c = self.cols
+        self._filter = (None if section is None else c.sections.codes.get(section, -1),
+                        None if typ is None else c.types.codes.get(typ, -1),
+                        None if since is None else _seconds(since.isoformat()),
+                        None if until is None else _seconds(until.isoformat()))
+        self._rebuild()
+
+    def set_columns(self, columns):
+        # Columnas leídas de nuevo (el fichero se ha reescrito): los códigos del filtro cambian
+        self.cols = columns
+        self.set_filter(*self._filter_args)
+
+    def refresh(self, store):
+        first = self.cols.sync(store)
+        self.rows_added(first, len(self.cols))
+
+    def rows_added(self, first, end):
+        # Filas [first, end) añadidas por un sync; las que ya recogió un _rebuild
+        # posterior (filtro u orden cambiados mientras tanto) no se repiten
+        if first == 0 or self._sort != (0, QtCore.Qt.AscendingOrder):
+            self._rebuild()
+            return
+        # Los nuevos van al final en el orden por fecha: basta con añadirlos
+        new = [i for i in range(max(first, self._seen), end) if self._matches(i)]
+        self._seen = max(self._seen, end)
+        if not new:
+            return
+        if self._loaded == len(self._rows):
+            self.beginInsertRows(QtCore.QModelIndex(), self._loaded, self._loaded + len(new) - 1)
+            self._rows.extend(new)
+            self._loaded = len(self._rows)
+            self.endInsertRows()
+        else:
+            self._rows.extend(new)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self._loaded < len(self._rows)
+
+    def fetchMore(self, parent):
+        n = min(self.BATCH, len(self._rows) - self._loaded)
+        self.beginInsertRows(QtCore.QModelIndex(), self._loaded, self._loaded + n - 1)
+        self._loaded += n
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        i, col, c = self._rows[index.row()], index.column(), self.cols
+        if role == QtCore.Qt.DisplayRole:
+            if col == 0: return c.date_text(i)
+            if col == 1: return c.sections.values[c.section[i]]
+            if col == 2: return c.types.values[c.type[i]]
+            if col == 3: return c.tests.values[c.test[i]]
+            if col == 4: return f"{c.score[i]}/{c.total[i]}"
+            return f"{c.percent(i):.2f}%"
+        if col == 5 and role == QtCore.Qt.BackgroundRole:
+            # Colores: verde >=80, amarillo >=60, rojo <60
+            pct = c.percent(i)
+            if pct >= 80:
+                return QtGui.QBrush(QtCore.Qt.green)
+            if pct >= 60:
+                return QtGui.QBrush(QtCore.Qt.yellow)
+            return QtGui.QBrush(QtCore.Qt.red)
+        if col == 5 and role == QtCore.Qt.TextAlignmentRole:
+            return QtCore.Qt.AlignCenter
+        return None
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        self._sort = (column, order)
+        self._rebuild()
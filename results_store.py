@@ -0,0 +1,166 @@
+import os
+import json
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Resultados en JSONL: una línea por examen, solo se añade al final.
+# Migra automáticamente el antiguo results.json la primera vez.
+
+@contextmanager
+def file_lock(path):
+    # Bloqueo exclusivo entre procesos sobre un fichero .lock aparte
+    with open(path, 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _dump(exam):
+    return (json.dumps(exam, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+def atomic_write(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class ResultsStore:
+    def __init__(self, path='results.jsonl', legacy=None, compact_every=500):
+        self.path = path
+        self.legacy = legacy
+        self.lock_path = path + '.lock'
+        self.compact_every = compact_every
+        self._appends = 0
+
+    def _migrate(self):
+        if os.path.exists(self.path) or not (self.legacy and os.path.exists(self.legacy)):
+            return
+        with open(self.legacy, 'r', encoding='utf-8') as f:
+            exams = json.load(f).get('exams', [])
+        for e in exams:
+            e.setdefault('id', uuid.uuid4().hex)
+        atomic_write(self.path, b''.join(_dump(e) for e in exams))
+        os.replace(self.legacy, self.legacy + '.migrated')
+
+    def read_from(self, offset=0):
+        # Genera (examen, offset tras la línea); ignora líneas incompletas o corruptas
+        if not os.path.exists(self.path):
+            if not (self.legacy and os.path.exists(self.legacy)):
+                return
+            with file_lock(self.lock_path):
+                self._migrate()
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    yield json.loads(line), offset
+                except ValueError:
+                    continue
+
+    def ends_with(self, offset, exam_id):
+        # Comprueba que el registro que termina en offset sigue siendo exam_id
+        # (tras una compactación los offsets guardados dejan de valer)
+        if offset == 0:
+            return True
+        try:
+            with open(self.path, 'rb') as f:
+                if f.seek(0, os.SEEK_END) < offset:
+                    return False
+                start = max(0, offset - 65536)
+                f.seek(start)
+                tail = f.read(offset - start)
+        except OSError:
+            return False
+        try:
+            return tail.endswith(b'\n') and json.loads(tail.rstrip(b'\n').rsplit(b'\n', 1)[-1]).get('id') == exam_id
+        except ValueError:
+            return False
+
+    def iter_exams(self):
+        for exam, _ in self.read_from(0):
+            yield exam
+
+    def load(self):
+        return {'exams': list(self.iter_exams())}
+
+    def append(self, exam):
+        self.append_many([exam])
+
+    def append_many(self, exams):
+        for e in exams:
+            e.setdefault('id', uuid.uuid4().hex)
+        data = b''.join(_dump(e) for e in exams)
+        with file_lock(self.lock_path):
+            self._migrate()
+            with open(self.path, 'a+b') as f:
+                # una escritura cortada no puede pegarse al registro siguiente
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        data = b'\n' + data
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        self._appends += len(exams)
+        if self.compact_every and self._appends >= self.compact_every:
+            self._appends = 0
+            self.compact()
+
+    def compact(self):
+        # Reescritura atómica sin líneas corruptas ni registros duplicados
+        with file_lock(self.lock_path):
+            self._migrate()
+            if not os.path.exists(self.path):
+                return False
+            seen, out, dirty = set(), [], False
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        exam = json.loads(line)
+                    except ValueError:
+                        dirty = True
+                        continue
+                    eid = exam.get('id')
+                    if eid is not None and eid in seen:
+                        dirty = True
+                        continue
+                    if not line.endswith(b'\n'):
+                        dirty = True
+                    seen.add(eid)
+                    out.append(_dump(exam))
+            if dirty:
+                atomic_write(self.path, b''.join(out))
+            return dirty
+
+    def save(self, data):
+        exams = data.get('exams', [])
+        for e in exams:
+            e.setdefault('id', uuid.uuid4().hex)
+        with file_lock(self.lock_path):
+            self._migrate()
+            atomic_write(self.path, b''.join(_dump(e) for e in exams))
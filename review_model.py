@@ -0,0 +1,103 @@
+from html import escape
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+# Revisión de un examen como lista modelo/vista: las filas se entregan por lotes
+# al hacer scroll, cada respuesta se pinta como texto enriquecido solo cuando es
+# visible y las alturas se estiman con métricas de fuente una vez por ancho.
+
+LINES = QtCore.Qt.UserRole
+
+class ReviewModel(QtCore.QAbstractListModel):
+    # Filas que se entregan a la vista de cada vez (más al llegar al final)
+    BATCH = 50
+
+    def __init__(self, answers, parent=None):
+        super().__init__(parent)
+        self.answers = answers
+        self._loaded = min(self.BATCH, len(answers))
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self._loaded < len(self.answers)
+
+    def fetchMore(self, parent):
+        n = min(self.BATCH, len(self.answers) - self._loaded)
+        self.beginInsertRows(QtCore.QModelIndex(), self._loaded, self._loaded + n - 1)
+        self._loaded += n
+        self.endInsertRows()
+
+    def _lines(self, row):
+        item = self.answers[row]
+        corr_txt = item.get('correct_text') or '–––'
+        sel_txt = item.get('selected_text') or 'Sin responder'
+        color_sel = 'green' if item.get('selected_letter') == item.get('correct_letter') else 'red'
+        return [(f'{row + 1}. Pregunta:', item['question'], None),
+                ('Correcta:', corr_txt, 'green'),
+                ('Tu respuesta:', sel_txt, color_sel)]
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == LINES:
+            return [label + ' ' + text for label, text, _ in self._lines(index.row())]
+        if role == QtCore.Qt.DisplayRole:
+            return '<br>'.join(
+                f'<span style="color:{color}"><b>{label}</b> {escape(text)}</span>' if color
+                else f'<b>{label}</b> {escape(text)}'
+                for label, text, color in self._lines(index.row()))
+        return None
+
+class HtmlDelegate(QtWidgets.QStyledItemDelegate):
+    MARGIN = 6
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self._heights = {}
+        self._width = None
+
+    def _text_width(self):
+        return max(50, self.view.viewport().width() - 2 * self.MARGIN)
+
+    def sizeHint(self, option, index):
+        # Altura estimada con la fuente en negrita (nunca menor que la real) sin
+        # construir el documento: así se pueden medir miles de filas
+        width = self._text_width()
+        if width != self._width:
+            self._heights.clear()
+            self._width = width
+        h = self._heights.get(index.row())
+        if h is None:
+            font = QtGui.QFont(self.view.font()); font.setBold(True)
+            fm = QtGui.QFontMetrics(font)
+            pad = 2 * int(QtGui.QTextDocument().documentMargin())
+            rect = QtCore.QRect(0, 0, width - pad, 1 << 20)
+            h = sum(fm.boundingRect(rect, QtCore.Qt.TextWordWrap, line).height() for line in index.data(LINES))
+            h = self._heights[index.row()] = h + pad + 2 * self.MARGIN
+        return QtCore.QSize(width, h)
+
+    def paint(self, painter, option, index):
+        # Solo las filas visibles llegan aquí: el texto enriquecido se monta al pintar
+        doc = QtGui.QTextDocument()
+        doc.setDefaultFont(self.view.font())
+        doc.setHtml(index.data())
+        doc.setTextWidth(self._text_width())
+        painter.save()
+        painter.translate(option.rect.left() + self.MARGIN, option.rect.top() + self.MARGIN)
+        doc.drawContents(painter)
+        painter.restore()
+        # separador entre respuestas
+        painter.setPen(option.palette.color(QtGui.QPalette.Mid))
+        painter.drawLine(option.rect.bottomLeft(), option.rect.bottomRight())
+
+def review_view(answers, parent=None):
+    view = QtWidgets.QListView(parent)
+    view.setModel(ReviewModel(answers, view))
+    view.setItemDelegate(HtmlDelegate(view))
+    view.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+    view.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+    view.setWordWrap(True)
+    view.setResizeMode(QtWidgets.QListView.Adjust)
+    return view
@@ -0,0 +1,137 @@
+import random
+import weakref
+from bisect import bisect_right
+from itertools import accumulate
+
+# Muestreo por índice: las preguntas se referencian como (fichero, posición)
+# y solo se copian las elegidas. Con semilla, el examen es reproducible.
+
+def half_files(files, half):
+    # Misma regla que siempre: por asignatura, temas ordenados y partidos por la mitad
+    grouped = {}
+    for bf in files:
+        if bf.subject is None or bf.topic is None:
+            continue
+        grouped.setdefault(bf.subject, []).append((bf.topic, bf.path, bf))
+    out = []
+    for subject, lst in grouped.items():
+        lst.sort(key=lambda t: t[:2])
+        mid = len(lst) // 2
+        out.extend(bf for _, _, bf in (lst[:mid] if half == 'first' else lst[mid:]))
+    return out
+
+class QuestionIndex:
+    def __init__(self, files, section):
+        self.files = list(files)
+        self.section = section
+        # starts[i] = posición global de la primera pregunta del fichero i
+        self.starts = [0] + list(accumulate(len(bf.questions) for bf in self.files))
+        self._qids = None
+
+    def __len__(self):
+        return self.starts[-1]
+
+    def ref(self, pos):
+        f = bisect_right(self.starts, pos) - 1
+        return f, pos - self.starts[f]
+
+    def materialize(self, pos):
+        f, offset = self.ref(pos)
+        bf = self.files[f]
+        return dict(bf.questions[offset], section=self.section, file=bf.path, qid=bf.qids[offset])
+
+    def qids(self):
+        # Ids de todas las preguntas en orden de posición (para calcular pesos)
+        if self._qids is None:
+            import numpy as np
+            self._qids = np.fromiter((qid for bf in self.files for qid in bf.qids),
+                                     dtype=np.int64, count=len(self))
+        return self._qids
+
+    def sample(self, k, seed=None, weights=None, clusters=None):
+        # clusters[pos] = grupo de casi duplicados (-1 si no tiene): como mucho uno por grupo
+        n = len(self)
+        k = min(k, n)
+        if weights is None:
+            # random.sample sobre un range no recorre la población: O(k)
+            rank = lambda m: random.Random(seed).sample(range(n), m)
+            total = n
+        else:
+            import numpy as np
+            w = np.asarray(weights, dtype=float)
+            if k == 0 or not (w > 0).any():
+                return []
+            # Efraimidis-Spirakis: clave log(u)/w; las k mayores son la muestra ponderada
+            rng = np.random.default_rng(seed)
+            with np.errstate(divide='ignore'):
+                keys = np.log(rng.random(n)) / w
+            total = int((w > 0).sum())
+            k = min(k, total)
+            def rank(m):
+                top = np.argpartition(-keys, m - 1)[:m]
+                return top[np.argsort(-keys[top])].tolist()
+        if clusters is None:
+            return rank(k)
+        # se ordenan algunos candidatos de más y se salta cada repetición de un
+        # grupo; solo si no bastan se ordena la población entera
+        m = min(total, 2 * k)
+        while True:
+            picked = _one_per_cluster(rank(m), clusters, k)
+            if len(picked) == k or m == total:
+                return picked
+            m = total
+
+    def draw(self, k, seed=None, weights=None, clusters=None):
+        if callable(weights):
+            weights = weights(self)
+        if callable(clusters):
+            clusters = clusters(self)
+        return [self.materialize(pos) for pos in self.sample(k, seed, weights, clusters)]
+
+def _one_per_cluster(ranked, clusters, k):
+    seen, out = set(), []
+    for pos in ranked:
+        c = clusters[pos]
+        if c >= 0:
+            if c in seen:
+                continue
+            seen.add(c)
+        out.append(pos)
+        if len(out) == k:
+            break
+    return out
+
+# banco -> {(sección, mitad): (versión, índice)}; se libera con el banco (un id()
+# se puede reutilizar y la versión de cada banco empieza en 0)
+_cache = weakref.WeakKeyDictionary()
+
+def get_index(bank, section, half=None):
+    # Se reconstruye solo si el banco ha cambiado (coste proporcional al nº de ficheros)
+    key = (section, half)
+    cache = _cache.setdefault(bank, {})
+    hit = cache.get(key)
+    if hit is not None and hit[0] == bank.version:
+        return hit[1]
+    version = bank.version
+    files = bank.files(section)
+    index = QuestionIndex(half_files(files, half) if half else files, section)
+    cache[key] = (version, index)
+    return index
+
+def recency_weights(qids, miss_qids, miss_times, now, half_life_days=7.0, boost=4.0):
+    # Peso 1 + boost * 0.5^(días desde el último fallo / vida media), vectorizado
+    import numpy as np
+    qids = np.asarray(qids)
+    w = np.ones(len(qids))
+    miss_qids = np.asarray(miss_qids)
+    if not len(miss_qids):
+        return w
+    miss_times = np.asarray(miss_times, dtype=float)
+    # orden por (id, instante): side='right' - 1 da el fallo más reciente de cada id
+    order = np.lexsort((miss_times, miss_qids))
+    mq, mt = miss_qids[order], miss_times[order]
+    pos = np.clip(np.searchsorted(mq, qids, side='right') - 1, 0, len(mq) - 1)
+    hit = mq[pos] == qids
+    age_days = np.maximum(now - mt[pos[hit]], 0) / 86400.0
+    w[hit] += boost * np.power(0.5, age_days / half_life_days)
+    return w
@@ -0,0 +1,108 @@
+import json
+from results_store import atomic_write
+
+# Agregados de estadísticas mantenidos de forma incremental sobre results.jsonl.
+# Se guardan junto a los resultados con el offset hasta el que están al día.
+STATS_VERSION = 1
+
+class StatsRollup:
+    def __init__(self, path):
+        self.path = path
+        self.reset()
+        self._load()
+
+    def reset(self):
+        self.count = self.score = self.total = 0
+        self.by_date = {}
+        self.by_type = {}
+        self.by_section = {}
+        self.offset = 0
+        self.last_id = None
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != STATS_VERSION:
+            return
+        self.count, self.score, self.total = data['count'], data['score'], data['total']
+        self.by_date, self.by_type, self.by_section = data['by_date'], data['by_type'], data['by_section']
+        self.offset, self.last_id = data['offset'], data['last_id']
+
+    def save(self):
+        data = {
+            'version': STATS_VERSION,
+            'count': self.count, 'score': self.score, 'total': self.total,
+            'by_date': self.by_date, 'by_type': self.by_type, 'by_section': self.by_section,
+            'offset': self.offset, 'last_id': self.last_id,
+        }
+        atomic_write(self.path, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    def add(self, exam):
+        score, total = exam['score'], exam['total']
+        self.count += 1; self.score += score; self.total += total
+        for groups, key in ((self.by_date, exam.get('date', '')[:10]),
+                            (self.by_type, exam.get('type', 'Desconocido')),
+                            (self.by_section, exam.get('section', 'General'))):
+            g = groups.get(key)
+            if g is None:
+                groups[key] = [1, score, total]
+            else:
+                g[0] += 1; g[1] += score; g[2] += total
+
+    def sync(self, store):
+        # Incorpora solo los exámenes añadidos desde la última vez (O(nuevos))
+        changed = not store.ends_with(self.offset, self.last_id)
+        if changed:
+            self.reset()
+        for exam, offset in store.read_from(self.offset):
+            self.add(exam)
+            self.offset, self.last_id = offset, exam.get('id')
+            changed = True
+        if changed:
+            self.save()
+        return changed
+
+    @staticmethod
+    def mean(group):
+        return (group[1] / group[2] * 100) if group[2] else 0
+
+# Resolución de la gráfica de evolución: la más fina que no pase de max_points
+BUCKETS = ('día', 'semana', 'mes')
+
+def _bucket(days, unit, np):
+    if unit == 'día':
+        return days
+    if unit == 'semana':
+        # semanas de lunes a domingo (el 1970-01-01 fue jueves)
+        n = days.astype(np.int64)
+        return (n - (n + 3) % 7).astype('datetime64[D]')
+    return days.astype('datetime64[M]').astype('datetime64[D]')
+
+def chart_series(by_date, max_points=400):
+    # Medias agregadas por día, semana o mes y recta de tendencia sobre fechas reales
+    import numpy as np
+    keys, score, total = [], [], []
+    for key, g in by_date.items():
+        try:
+            np.datetime64(key, 'D')
+        except ValueError:
+            continue
+        keys.append(key); score.append(g[1]); total.append(g[2])
+    days = np.array(keys, dtype='datetime64[D]')
+    score, total = np.array(score, dtype=float), np.array(total, dtype=float)
+    for unit in BUCKETS:
+        buckets = _bucket(days, unit, np)
+        x, inv = np.unique(buckets, return_inverse=True)
+        if len(x) <= max_points:
+            break
+    s = np.bincount(inv, weights=score, minlength=len(x))
+    t = np.bincount(inv, weights=total, minlength=len(x))
+    y = np.divide(s * 100, t, out=np.zeros(len(x)), where=t > 0)
+    trend = None
+    if len(x) > 1:
+        xs = x.astype(np.int64).astype(float)
+        trend = np.poly1d(np.polyfit(xs, y, 1))(xs)
+    return {'unit': unit, 'x': x, 'y': y, 'trend': trend}
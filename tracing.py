@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import time
+import atexit
+import inspect
+import threading
+import functools
+
+# Trazas opcionales: con TEST_TRACE=traza.json (o --trace en la app) se registran
+# intervalos alrededor de las funciones instrumentadas y al salir se escribe un
+# fichero para chrome://tracing / ui.perfetto.dev y un resumen p50/p95 por operación.
+# Desactivado no se envuelve nada, así que no añade ningún coste.
+ENV_VAR = 'TEST_TRACE'
+
+_path = None
+_events = []
+_threads = {}
+_t0 = time.perf_counter_ns()
+
+def enable(path=None):
+    global _path
+    if _path is None:
+        atexit.register(write)
+    _path = path or 'trace.json'
+
+def from_env(argv=None):
+    # --trace [fichero] en la línea de órdenes o TEST_TRACE en el entorno
+    argv = sys.argv if argv is None else argv
+    if '--trace' in argv:
+        i = argv.index('--trace')
+        nxt = argv[i + 1] if i + 1 < len(argv) else None
+        enable(nxt if nxt and not nxt.startswith('-') else None)
+    elif os.environ.get(ENV_VAR):
+        value = os.environ[ENV_VAR]
+        enable(None if value == '1' else value)
+    return _path is not None
+
+def _record(name, start, end, cat):
+    tid = threading.get_ident()
+    if tid not in _threads:
+        _threads[tid] = threading.current_thread().name
+    _events.append((name, cat, tid, start, end))
+
+def _arity(fn):
+    # nº de argumentos posicionales que acepta fn (None si acepta *args)
+    try:
+        params = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    if any(p.kind == p.VAR_POSITIONAL for p in params):
+        return None
+    return sum(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in params)
+
+def traced(fn, name=None, cat='app', slot=False):
+    name = name or getattr(fn, '__qualname__', repr(fn))
+    # PyQt pasa a los slots los argumentos de la señal (p. ej. checked) y descarta
+    # los que sobran según la firma; el envoltorio tiene que hacer lo mismo
+    n = _arity(fn) if slot else None
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if n is not None:
+            args = args[:n]
+        start = time.perf_counter_ns()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record(name, start, time.perf_counter_ns(), cat)
+    return wrapper
+
+def patch(owner, names, prefix=None, cat='app', slot=False):
+    # Sustituye owner.<nombre> por su versión instrumentada (solo si está activado)
+    if _path is None:
+        return
+    prefix = prefix or getattr(owner, '__name__', type(owner).__name__)
+    for attr in names:
+        fn = getattr(owner, attr)
+        setattr(owner, attr, traced(fn, f'{prefix}.{attr}', cat, slot))
+
+def summary():
+    groups = {}
+    for name, _, _, start, end in list(_events):
+        groups.setdefault(name, []).append((end - start) / 1e6)
+    out = {}
+    for name, durs in groups.items():
+        durs.sort()
+        n = len(durs)
+        out[name] = {'count': n, 'total_ms': round(sum(durs), 3),
+                     'p50_ms': round(durs[(n - 1) // 2], 3),
+                     'p95_ms': round(durs[min(n - 1, int(0.95 * n))], 3),
+                     'max_ms': round(durs[-1], 3)}
+    return dict(sorted(out.items(), key=lambda kv: -kv[1]['total_ms']))
+
+def write():
+    if _path is None:
+        return
+    pid = os.getpid()
+    events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': tname}}
+              for tid, tname in _threads.items()]
+    events.extend({'name': name, 'cat': cat, 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - _t0) / 1000, 'dur': (end - start) / 1000}
+                  for name, cat, tid, start, end in list(_events))
+    with open(_path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    stats = summary()
+    with open(os.path.splitext(_path)[0] + '.summary.json', 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
+    print(f"\n{'operación':<44}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'total ms':>11}", file=sys.stderr)
+    for name, s in stats.items():
+        print(f"{name:<44}{s['count']:>6}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['total_ms']:>11.1f}",
+              file=sys.stderr)
+    print(f'Traza en {_path}', file=sys.stderr)
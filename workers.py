@@ -0,0 +1,59 @@
+import threading
+from PyQt5 import QtCore
+
+# Tareas en segundo plano sobre el QThreadPool global, con progreso y cancelación.
+# fn recibe progress(hechos, total), que lanza Cancelled si se ha cancelado.
+
+class Cancelled(Exception):
+    pass
+
+class TaskSignals(QtCore.QObject):
+    progress = QtCore.pyqtSignal(int, int)
+    finished = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+    ended = QtCore.pyqtSignal()
+
+class Task(QtCore.QRunnable):
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.signals = TaskSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def report(self, done, total):
+        if self.cancelled:
+            raise Cancelled()
+        self.signals.progress.emit(done, total)
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, progress=self.report, **self.kwargs)
+            if not self.cancelled:
+                self.signals.finished.emit(result)
+        except Cancelled:
+            pass
+        except Exception as exc:
+            if not self.cancelled:
+                self.signals.failed.emit(str(exc) or type(exc).__name__)
+        finally:
+            self.signals.ended.emit()
+
+# Las tareas vivas se guardan aquí hasta que el hilo principal recibe 'ended'
+_active = set()
+
+def run_task(fn, *args, on_done=None, on_error=None, on_progress=None, **kwargs):
+    task = Task(fn, *args, **kwargs)
+    if on_done: task.signals.finished.connect(on_done)
+    if on_error: task.signals.failed.connect(on_error)
+    if on_progress: task.signals.progress.connect(on_progress)
+    _active.add(task)
+    task.signals.ended.connect(lambda: _active.discard(task))
+    QtCore.QThreadPool.globalInstance().start(task)
+    return task